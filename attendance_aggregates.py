@@ -0,0 +1,288 @@
+import argparse
+import bisect
+import csv
+import datetime
+import json
+import os
+import threading
+
+from file_lock import FileLock
+
+# Materialized views kept next to the attendance CSVs:
+#   aggregates/students.json   class days plus per-student days present, first and last seen
+#   aggregates/days/<date>.json  who was present on a day, with first and last time seen
+AGGREGATE_DIR = "aggregates"
+
+# Rows the recognizers write for faces they could not identify
+UNKNOWN_IDS = {"", "unknown", "none", "nan"}
+
+_DATE_FORMATS = ('%d-%m-%Y', '%Y-%m-%d')
+
+
+def normalize_date(value):
+    """ISO date from either of the app's date formats (the desktop app writes dd-mm-YYYY, Flask YYYY-mm-dd)"""
+    value = str(value).strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {value!r}")
+
+
+def normalize_time(value):
+    """24-hour HH:MM:SS from either '09:05:00 AM' or '09:05:00'"""
+    value = str(value).strip()
+    for fmt in ('%I:%M:%S %p', '%H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(value, fmt).strftime('%H:%M:%S')
+        except ValueError:
+            continue
+    return value
+
+
+def _row_value(row, *keys):
+    for key in keys:
+        if key in row and row[key] is not None:
+            return str(row[key]).strip()
+    return ""
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class AttendanceAggregates:
+    """Per-student and per-day attendance totals, updated as records are written
+
+    Writers call record() with the rows they just appended; readers get
+    lookups from the materialized files instead of rescanning every
+    Attendance_*.csv. Updates from several processes are serialized with a
+    lock file, and parsed files are cached until they change on disk.
+    """
+
+    def __init__(self, attendance_path):
+        self.attendance_path = attendance_path
+        self.directory = os.path.join(attendance_path, AGGREGATE_DIR)
+        self.students_path = os.path.join(self.directory, "students.json")
+        self.days_path = os.path.join(self.directory, "days")
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def _file_lock(self):
+        return FileLock(os.path.join(self.directory, ".lock"))
+
+    def _load(self, path, default):
+        """Parsed JSON file, reparsed only when it changes on disk"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return default
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cached = self._cache.get(path)
+        if cached is None or cached[0] != stamp:
+            cached = self._cache[path] = (stamp, _read_json(path, default))
+        return cached[1]
+
+    def _day_path(self, date):
+        return os.path.join(self.days_path, f"{date}.json")
+
+    def ensure_built(self):
+        """Build the aggregates from the CSVs the first time they are needed"""
+        if not os.path.isfile(self.students_path):
+            self.rebuild()
+
+    def _apply(self, summary, days, rows):
+        """Fold rows into the loaded summary and day maps, returns the dates touched"""
+        touched = set()
+        for row in rows:
+            student_id = _row_value(row, 'id', 'ID')
+            if student_id.lower() in UNKNOWN_IDS:
+                continue
+            try:
+                date = normalize_date(_row_value(row, 'date', 'Date'))
+            except ValueError:
+                continue
+            seen = normalize_time(_row_value(row, 'time', 'Time'))
+            name = _row_value(row, 'name', 'Name')
+
+            if date not in days:
+                days[date] = _read_json(self._day_path(date), {})
+            day = days[date]
+            if date not in summary['days']:
+                summary['days'].append(date)
+                summary['days'].sort()
+
+            student = summary['students'].setdefault(student_id, {
+                'name': name, 'days_present': 0, 'first_seen': None, 'last_seen': None})
+            if name:
+                student['name'] = name
+            stamp = f"{date} {seen}"
+            if student['first_seen'] is None or stamp < student['first_seen']:
+                student['first_seen'] = stamp
+            if student['last_seen'] is None or stamp > student['last_seen']:
+                student['last_seen'] = stamp
+
+            entry = day.get(student_id)
+            if entry is None:
+                day[student_id] = {'name': name, 'first': seen, 'last': seen}
+                student['days_present'] += 1
+            else:
+                entry['first'] = min(entry['first'], seen)
+                entry['last'] = max(entry['last'], seen)
+            touched.add(date)
+        return touched
+
+    def record(self, rows):
+        """Fold newly written attendance rows into the aggregates"""
+        rows = list(rows)
+        if not rows:
+            return
+        self.ensure_built()
+        with self._lock, self._file_lock():
+            summary = _read_json(self.students_path, {'days': [], 'students': {}})
+            days = {}
+            for date in self._apply(summary, days, rows):
+                _write_json(self._day_path(date), days[date])
+            _write_json(self.students_path, summary)
+
+    def rebuild(self):
+        """Recompute everything from the Attendance_*.csv files (first use or after manual edits)"""
+        os.makedirs(self.days_path, exist_ok=True)
+        with self._lock, self._file_lock():
+            summary = {'days': [], 'students': {}}
+            days = {}
+            for filename in sorted(os.listdir(self.attendance_path)):
+                if not (filename.startswith("Attendance_") and filename.endswith(".csv")):
+                    continue
+                try:
+                    with open(os.path.join(self.attendance_path, filename), newline='') as f:
+                        rows = list(csv.DictReader(f))
+                except (OSError, csv.Error) as e:
+                    print(f"Error reading {filename}: {e}")
+                    continue
+                # Existing day files are stale, start each day from scratch
+                for row in rows:
+                    try:
+                        days.setdefault(normalize_date(_row_value(row, 'date', 'Date')), {})
+                    except ValueError:
+                        continue
+                self._apply(summary, days, rows)
+            for name in os.listdir(self.days_path):
+                if name.endswith(".json") and name[:-5] not in days:
+                    os.remove(os.path.join(self.days_path, name))
+            for date, day in days.items():
+                _write_json(self._day_path(date), day)
+            _write_json(self.students_path, summary)
+
+    # Queries
+
+    def _summary(self):
+        self.ensure_built()
+        return self._load(self.students_path, {'days': [], 'students': {}})
+
+    def class_days(self):
+        return len(self._summary()['days'])
+
+    def student(self, student_id):
+        """Days present, first and last seen and attendance percentage of one student, None if never seen"""
+        summary = self._summary()
+        student = summary['students'].get(str(student_id))
+        if student is None:
+            return None
+        total = len(summary['days'])
+        return dict(student, id=str(student_id), class_days=total,
+                    percentage=100.0 * student['days_present'] / total if total else 0.0)
+
+    def students(self):
+        """Every student's totals, as returned by student()"""
+        summary = self._summary()
+        total = len(summary['days'])
+        return [dict(student, id=student_id, class_days=total,
+                     percentage=100.0 * student['days_present'] / total if total else 0.0)
+                for student_id, student in sorted(summary['students'].items())]
+
+    def day(self, date):
+        """Students present on a date (either date format) as attendance records"""
+        self.ensure_built()
+        date = normalize_date(date)
+        day = self._load(self._day_path(date), {})
+        return [{'id': student_id, 'name': entry['name'], 'date': date, 'time': entry['first'],
+                 'last_seen': entry['last']}
+                for student_id, entry in sorted(day.items(), key=lambda item: item[1]['first'])]
+
+    def day_count(self, date):
+        return len(self._load(self._day_path(normalize_date(date)), {}))
+
+    def dates(self, start=None, end=None):
+        """Class days from start to end inclusive (either date format, None for open), oldest first"""
+        days = self._summary()['days']
+        low = bisect.bisect_left(days, normalize_date(start)) if start else 0
+        high = bisect.bisect_right(days, normalize_date(end)) if end else len(days)
+        return days[low:high]
+
+    def history(self, student_id, start=None, end=None):
+        """Days one student was present from start to end, with first and last time seen"""
+        student_id = str(student_id)
+        history = []
+        for date in self.dates(start, end):
+            entry = self._load(self._day_path(date), {}).get(student_id)
+            if entry is not None:
+                history.append({'date': date, 'time': entry['first'], 'last_seen': entry['last']})
+        return history
+
+    def version(self):
+        """Files whose (path, mtime_ns, size) change whenever any aggregate does
+
+        Every record() and rebuild() rewrites students.json, so its stamp
+        versions the whole set.
+        """
+        self.ensure_built()
+        st = os.stat(self.students_path)
+        return [(self.students_path, st.st_mtime_ns, st.st_size)]
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def aggregates_for(attendance_path):
+    """Shared AttendanceAggregates for an attendance directory"""
+    key = os.path.abspath(attendance_path)
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = AttendanceAggregates(attendance_path)
+        return _instances[key]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or query the attendance aggregates")
+    parser.add_argument("--attendance", default="Attendance", help="Attendance directory")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute from the CSV files")
+    parser.add_argument("--student", default=None, help="Show one student's totals")
+    parser.add_argument("--day", default=None, help="Show who was present on a date")
+    args = parser.parse_args()
+
+    aggregates = AttendanceAggregates(args.attendance)
+    if args.rebuild:
+        aggregates.rebuild()
+        print(f"Aggregates rebuilt: {aggregates.class_days()} class days")
+    if args.student:
+        print(json.dumps(aggregates.student(args.student), indent=1))
+    elif args.day:
+        print(json.dumps(aggregates.day(args.day), indent=1))
+    elif not args.rebuild:
+        for student in aggregates.students():
+            print(f"{student['id']}  {student['name']:<20} {student['days_present']:>3}/{student['class_days']} days  "
+                  f"{student['percentage']:5.1f}%  last seen {student['last_seen']}")
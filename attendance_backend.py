@@ -1,20 +1,37 @@
-import cv2
 import os
 import csv
-import numpy as np
-from PIL import Image
-import pandas as pd
 import datetime
 import time
 import re
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+import threading
 import tkinter.messagebox as mess
 import tkinter.simpledialog as simpledialog
 
+from fast_start import lazy_import, STARTUP_TIMER
+
+# Heavy modules are imported on first use so the window can appear quickly
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+Image = lazy_import("PIL.Image")
+face_matcher = lazy_import("face_matcher")
+model_compression = lazy_import("model_compression")
+model_store = lazy_import("model_store")
+frame_profiler = lazy_import("frame_profiler")
+frame_source = lazy_import("frame_source")
+multi_camera = lazy_import("multi_camera")
+camera_manager = lazy_import("camera_manager")
+face_normalizer = lazy_import("face_normalizer")
+model_shards = lazy_import("model_shards")
+attendance_aggregates = lazy_import("attendance_aggregates")
+enrollment = lazy_import("enrollment")
+training_job = lazy_import("training_job")
+parallel_training = lazy_import("parallel_training")
+streaming_training = lazy_import("streaming_training")
+frame_scheduler = lazy_import("frame_scheduler")
+frame_dedup = lazy_import("frame_dedup")
+frame_overlays = lazy_import("frame_overlays")
+
 class AttendanceBackend:
     def __init__(self):
         self.haarcascade_path = "haarcascade_frontalface_default.xml"
@@ -22,6 +39,24 @@ class AttendanceBackend:
         self.training_label_path = "TrainingImageLabel/"
         self.student_details_path = "StudentDetails/"
         self.attendance_path = "Attendance/"
+        self.profile_path = "Profiles/"
+        
+        # Device index, video file, image directory or stream URL (ATTENDANCE_CAMERA)
+        self.camera_source = os.environ.get("ATTENDANCE_CAMERA", "0")
+        
+        # Comma separated sources for multi-camera sessions (ATTENDANCE_CAMERAS)
+        self.camera_sources = [s.strip() for s in os.environ.get("ATTENDANCE_CAMERAS", "").split(",") if s.strip()]
+        if not self.camera_sources:
+            self.camera_sources = [self.camera_source]
+        
+        # Section whose roster-only model attendance uses (ATTENDANCE_SECTION), None for everyone
+        self.section = os.environ.get("ATTENDANCE_SECTION", "").strip() or None
+        
+        # Train a chunk of images at a time with bounded memory (ATTENDANCE_TRAIN_STREAMING)
+        self.streaming_training = os.environ.get("ATTENDANCE_TRAIN_STREAMING", "0").strip().lower() in ("1", "true", "yes")
+        
+        # Opt-in per-stage profiling of attendance sessions
+        self.profile_sessions = os.environ.get("ATTENDANCE_PROFILE", "0").strip().lower() in ("1", "true", "yes")
         
         # Create directories
         self.assure_path_exists(self.training_image_path)
@@ -29,6 +64,15 @@ class AttendanceBackend:
         self.assure_path_exists(self.student_details_path)
         self.assure_path_exists(self.attendance_path)
         
+        # Detector and model shared by attendance sessions, see preload_models()
+        self._model_lock = threading.Lock()
+        self._face_detector = None
+        self._recognizers = {}  # model path -> (mtime, matcher)
+        self._face_normalizer = None
+        
+        # Camera kept open across capture, attendance and health checks, see get_camera()
+        self._camera = None
+        
     def assure_path_exists(self, path):
         """Ensure directory exists, create if not"""
         if not os.path.exists(path):
@@ -38,6 +82,74 @@ class AttendanceBackend:
         """Check if haarcascade file exists"""
         return os.path.isfile(self.haarcascade_path)
     
+    def get_face_detector(self):
+        """Get the shared Haar cascade, loading it on first use"""
+        with self._model_lock:
+            if self._face_detector is None:
+                self._face_detector = cv2.CascadeClassifier(self.haarcascade_path)
+            return self._face_detector
+    
+    def get_face_normalizer(self):
+        """Get the face normalizer shared by capture, training and attendance"""
+        with self._model_lock:
+            if self._face_normalizer is None:
+                self._face_normalizer = face_normalizer.default_normalizer()
+            return self._face_normalizer
+    
+    def get_camera(self):
+        """Get the shared camera manager for the configured source"""
+        with self._model_lock:
+            if self._camera is None:
+                self._camera = camera_manager.CameraManager(self.camera_source)
+            return self._camera
+    
+    def acquire_camera(self, job, timeout=0):
+        """Lease the shared camera for a job, None if another job is using it"""
+        try:
+            return self.get_camera().acquire(job, timeout)
+        except camera_manager.CameraBusy as e:
+            print(e)
+            return None
+    
+    def get_recognizer(self, section=None):
+        """Get the shared face matcher for a section (or everyone), reloading it only when the model file changes"""
+        model_path = model_shards.resolve_shard_path(self.training_label_path, section)
+        if model_path is None:
+            if section:
+                print(f"No model for section {section}, using the full model")
+            model_path = model_store.resolve_model_path(self.training_label_path)
+        if model_path is None:
+            return None
+        
+        mtime = os.path.getmtime(model_path)
+        with self._model_lock:
+            cached = self._recognizers.get(model_path)
+            if cached is None or cached[0] != mtime:
+                recognizer = face_matcher.LBPHMatcher()
+                # Read into memory rather than mapping, so retraining can replace the file
+                recognizer.read(model_path, mmap=False)
+                cached = self._recognizers[model_path] = (mtime, recognizer)
+            return cached[1]
+    
+    def preload_modules(self):
+        """Import the heavy modules ahead of first use"""
+        for module in (np, pd, cv2, face_matcher):
+            try:
+                getattr(module, "__name__")
+            except Exception as e:
+                print(f"Error preloading {module}: {e}")
+    
+    def preload_models(self):
+        """Load the cascade and trained model ahead of the first attendance session"""
+        try:
+            if self.check_haarcascade_file():
+                with STARTUP_TIMER.phase("preload cascade"):
+                    self.get_face_detector()
+            with STARTUP_TIMER.phase("preload model"):
+                self.get_recognizer(self.section)
+        except Exception as e:
+            print(f"Error preloading models: {e}")
+    
     # FRONTEND COMPATIBILITY METHODS
     def get_registration_count(self):
         """Get total number of registrations - FRONTEND COMPATIBLE"""
@@ -49,19 +161,15 @@ class AttendanceBackend:
     
     def student_exists(self, student_id):
         """Check if student already exists - FRONTEND COMPATIBLE"""
-        student_file = os.path.join(self.student_details_path, "StudentDetails.csv")
-        if os.path.isfile(student_file):
-            try:
-                df = pd.read_csv(student_file)
-                return student_id in df['ID'].astype(str).values
-            except:
-                return False
-        return False
+        try:
+            return self.get_enrollment().exists(student_id)
+        except Exception:
+            return False
     
-    def capture_images(self, student_id, student_name):
+    def capture_images(self, student_id, student_name, preview=None):
         """Capture face images for training - FRONTEND COMPATIBLE"""
         try:
-            success, message = self.capture_images_internal(student_id, student_name)
+            success, message = self.capture_images_internal(student_id, student_name, preview)
             return success
         except Exception as e:
             print(f"Error in capture_images: {e}")
@@ -76,10 +184,13 @@ class AttendanceBackend:
             print(f"Error in train_model: {e}")
             return False
     
-    def take_attendance(self):
+    def take_attendance(self, preview=None):
         """Take attendance using face recognition - FRONTEND COMPATIBLE"""
         try:
-            success, message, attendance_data = self.take_attendance_internal()
+            if len(self.camera_sources) > 1:
+                success, message, attendance_data = self.take_attendance_multi()
+            else:
+                success, message, attendance_data = self.take_attendance_internal(preview=preview)
             return success
         except Exception as e:
             print(f"Error in take_attendance: {e}")
@@ -203,6 +314,8 @@ class AttendanceBackend:
     def cleanup(self):
         """Cleanup resources - FRONTEND COMPATIBLE"""
         # Close any open camera connections
+        if self._camera is not None:
+            self._camera.close()
         cv2.destroyAllWindows()
     
     # REFRESH FUNCTIONALITY METHODS - FRONTEND COMPATIBLE
@@ -237,14 +350,8 @@ class AttendanceBackend:
     def refresh_camera_connection(self):
         """Refresh camera connection - FRONTEND COMPATIBLE"""
         try:
-            # Test camera connection
-            cam = cv2.VideoCapture(0)
-            if cam.isOpened():
-                ret, frame = cam.read()
-                cam.release()
-                cv2.destroyAllWindows()
-                return ret  # True if camera works
-            return False
+            # Answered from recent frames when a job is using the camera, probed only when idle
+            return self.get_camera().is_healthy()
         except Exception as e:
             print(f"Error checking camera: {e}")
             return False
@@ -302,25 +409,16 @@ class AttendanceBackend:
         self.save_new_password(new_password)
         return True, "Password changed successfully"
     
+    def get_enrollment(self):
+        """Registry shared with the other registration desks on this StudentDetails folder"""
+        return enrollment.EnrollmentService(self.student_details_path)
+    
     def get_next_serial_number(self):
-        """Get next serial number for student registration"""
-        student_file = os.path.join(self.student_details_path, "StudentDetails.csv")
-        
-        if os.path.isfile(student_file):
-            try:
-                df = pd.read_csv(student_file)
-                return len(df) + 1
-            except:
-                return 1
-        else:
-            # Create new file with headers
-            columns = ['SERIAL NO.', 'ID', 'NAME']
-            df = pd.DataFrame(columns=columns)
-            df.to_csv(student_file, index=False)
-            return 1
-    
-    def capture_images_internal(self, student_id, name):
-        """Capture face images for training"""
+        """Get next serial number for student registration (a preview; capture allocates its own)"""
+        return self.get_enrollment().next_serial()
+    
+    def capture_images_internal(self, student_id, name, preview=None):
+        """Capture face images for training (shown in preview when given, else in a cv2 window)"""
         if not self.check_haarcascade_file():
             return False, "Haarcascade file missing. Please download haarcascade_frontalface_default.xml"
         
@@ -330,13 +428,22 @@ class AttendanceBackend:
         if not self.is_valid_name(name):
             return False, "Invalid name format"
         
-        serial = self.get_next_serial_number()
+        registry = self.get_enrollment()
+        if registry.exists(student_id):
+            return False, f"Student ID {student_id} is already registered"
+        
+        # Reserved now so desks capturing at the same time never share a serial
+        serial = registry.allocate_serial()
         
-        cam = cv2.VideoCapture(0)
+        cam = self.acquire_camera("capture")
+        if cam is None:
+            return False, "Camera is busy with another job"
         if not cam.isOpened():
+            cam.release()
             return False, "Camera not accessible"
         
         detector = cv2.CascadeClassifier(self.haarcascade_path)
+        normalizer = self.get_face_normalizer()
         sample_num = 0
         
         try:
@@ -351,7 +458,6 @@ class AttendanceBackend:
                 faces = detector.detectMultiScale(gray, 1.3, 5)
                 
                 for (x, y, w, h) in faces:
-                    cv2.rectangle(img, (x, y), (x + w, y + h), (255, 0, 0), 2)
                     sample_num += 1
                     
                     # Save image
@@ -359,92 +465,250 @@ class AttendanceBackend:
                         self.training_image_path,
                         f"{name}.{serial}.{student_id}.{sample_num}.jpg"
                     )
-                    cv2.imwrite(image_path, gray[y:y + h, x:x + w])
-                    
-                    # Show progress
-                    cv2.putText(img, f"Capturing: {sample_num}/60", (10, 30), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                    cv2.imwrite(image_path, normalizer.crop(gray, (x, y, w, h)))
                 
-                cv2.imshow('Capturing Images', img)
+                # Show progress
+                overlays = [(box, None, (255, 0, 0)) for box in faces]
+                status = [f"Capturing: {sample_num}/60"]
+                if preview is not None:
+                    preview.show(img, overlays, status)
+                    time.sleep(0.1)
+                    stop = preview.stop_requested()
+                else:
+                    frame_overlays.draw_overlays(img, overlays, status)
+                    cv2.imshow('Capturing Images', img)
+                    stop = cv2.waitKey(100) & 0xFF == ord('q')
                 
-                if cv2.waitKey(100) & 0xFF == ord('q') or sample_num >= 60:
+                if stop or sample_num >= 60:
                     break
             
             cam.release()
-            cv2.destroyAllWindows()
+            if preview is None:
+                cv2.destroyAllWindows()
             
             if sample_num > 0:
                 # Save student details
-                self.save_student_details(serial, student_id, name)
+                try:
+                    self.save_student_details(serial, student_id, name)
+                except enrollment.EnrollmentError as e:
+                    return False, str(e)
                 return True, f"Images captured for ID: {student_id}"
             else:
                 return False, "No face detected. Please try again."
             
         except Exception as e:
             cam.release()
-            cv2.destroyAllWindows()
+            if preview is None:
+                cv2.destroyAllWindows()
             return False, f"Error capturing images: {str(e)}"
     
     def save_student_details(self, serial, student_id, name):
-        """Save student details to CSV"""
-        student_file = os.path.join(self.student_details_path, "StudentDetails.csv")
-        
-        # Create or append to CSV
-        new_row = {'SERIAL NO.': serial, 'ID': student_id, 'NAME': name}
-        
-        if os.path.exists(student_file):
-            df = pd.read_csv(student_file)
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        else:
-            df = pd.DataFrame([new_row])
-        
-        df.to_csv(student_file, index=False)
+        """Append student details to CSV (raises EnrollmentError if the ID was registered meanwhile)"""
+        self.get_enrollment().commit(serial, student_id, name)
     
-    def get_images_and_labels(self, path):
-        """Get face images and labels for training"""
-        image_paths = [os.path.join(path, f) for f in os.listdir(path) if f.endswith('.jpg')]
+    def get_images_and_labels(self, path, progress=None, cancelled=None):
+        """Get face images and labels for training
+        
+        progress(stage, done, total) is called after every image; training stops
+        with TrainingCancelled as soon as cancelled() returns True.
+        """
+        image_paths = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.jpg')]
+        normalizer = self.get_face_normalizer()
         faces = []
         ids = []
         
-        for image_path in image_paths:
+        for done, image_path in enumerate(image_paths, 1):
+            if cancelled is not None and cancelled():
+                raise training_job.TrainingCancelled()
             try:
                 pil_image = Image.open(image_path).convert('L')
                 image_np = np.array(pil_image, 'uint8')
                 student_id = int(os.path.split(image_path)[-1].split(".")[1])
-                faces.append(image_np)
+                faces.append(normalizer.normalize(image_np))
                 ids.append(student_id)
             except (ValueError, IndexError) as e:
                 print(f"Error processing {image_path}: {e}")
                 continue
+            finally:
+                if progress is not None:
+                    progress("loading", done, len(image_paths))
         
         return faces, ids
     
-    def train_images(self):
-        """Train the face recognition model"""
+    def train_images(self, prototypes=None, progress=None, cancelled=None):
+        """Train the face recognition model, optionally compressing it to prototypes per student
+        
+        progress and cancelled are as for get_images_and_labels; a cancelled run
+        returns (False, "Training cancelled") and leaves the existing model untouched.
+        """
         if not self.check_haarcascade_file():
             return False, "Haarcascade file missing"
         
+        def report(stage, done=0, total=0):
+            if progress is not None:
+                progress(stage, done, total)
+        
+        if self.streaming_training:
+            return self.train_images_streaming(prototypes, progress, cancelled)
+        
         try:
-            print("Loading training images...")
-            faces, ids = self.get_images_and_labels(self.training_image_path)
+            recognizer = face_matcher.LBPHMatcher()
+            samples = parallel_training.training_samples(self.training_image_path)
+            workers = min(parallel_training.configured_workers(), len(samples) // parallel_training.SHARDS_PER_WORKER)
             
-            if len(faces) == 0:
-                return False, "No training images found. Please capture images first."
-            
-            print(f"Training with {len(faces)} images...")
+            if len(samples) >= parallel_training.PARALLEL_MIN_SAMPLES and workers > 1:
+                # Large rosters: load and histogram shards of the images in worker processes
+                print(f"Training with {len(samples)} images on {workers} workers...")
+                histograms, ids = parallel_training.compute_histograms_parallel(
+                    samples, self.get_face_normalizer(), recognizer, workers, progress, cancelled)
+                if len(ids) == 0:
+                    return False, "No training images found. Please capture images first."
+            else:
+                print("Loading training images...")
+                faces, ids = self.get_images_and_labels(self.training_image_path, progress, cancelled)
+                
+                if len(faces) == 0:
+                    return False, "No training images found. Please capture images first."
+                
+                print(f"Training with {len(faces)} images...")
+                
+                histograms = np.empty((len(faces), recognizer.feature_size), np.float32)
+                for i, face in enumerate(faces):
+                    if cancelled is not None and cancelled():
+                        raise training_job.TrainingCancelled()
+                    histograms[i] = recognizer.compute_histogram(face)
+                    report("histograms", i + 1, len(faces))
+            recognizer.set_histograms(histograms, np.array(ids))
+            count = len(ids)
             
-            recognizer = cv2.face.LBPHFaceRecognizer_create()
-            recognizer.train(faces, np.array(ids))
+            # Last chance to back out; from here on the model files are replaced
+            if cancelled is not None and cancelled():
+                raise training_job.TrainingCancelled()
             
             print("Saving trained model...")
+            report("writing")
             model_path = os.path.join(self.training_label_path, "Trainer.yml")
             recognizer.save(model_path)
+            recognizer.save(model_store.binary_path_for(model_path))
+            report("written")
+            
+            return self.finish_training(recognizer, count, prototypes, report)
+            
+        except training_job.TrainingCancelled:
+            return False, "Training cancelled"
+        except Exception as e:
+            return False, f"Training failed: {str(e)}"
+    
+    def train_images_streaming(self, prototypes=None, progress=None, cancelled=None):
+        """Train a chunk of images at a time, writing the model as it goes, so memory does not grow with the roster"""
+        def report(stage, done=0, total=0):
+            if progress is not None:
+                progress(stage, done, total)
+        
+        try:
+            print("Streaming training images...")
+            model_path = os.path.join(self.training_label_path, "Trainer.yml")
+            result = streaming_training.train_streaming(self.training_image_path, model_path,
+                                                        self.get_face_normalizer(), progress=progress,
+                                                        cancelled=cancelled)
+            print(streaming_training.format_report(result))
+            if result['samples'] == 0:
+                return False, "No training images found. Please capture images first."
+            report("written")
             
-            return True, f"Training completed. Total images: {len(faces)}"
+            # Only the section split needs the model loaded; compressing replaces the
+            # file, which fails on Windows while it is memory-mapped
+            recognizer = None
+            if not prototypes:
+                recognizer = face_matcher.LBPHMatcher()
+                recognizer.read(model_store.binary_path_for(model_path))
+            success, message = self.finish_training(recognizer, result['samples'], prototypes, report)
+            if success and result['peak_rss_mb'] is not None:
+                message = f"{message}. Peak memory: {result['peak_rss_mb']:.0f} MB"
+            return success, message
             
+        except training_job.TrainingCancelled:
+            return False, "Training cancelled"
         except Exception as e:
             return False, f"Training failed: {str(e)}"
     
+    def finish_training(self, recognizer, count, prototypes, report):
+        """Compress or split a freshly written model into section models"""
+        if prototypes:
+            report("compressing")
+            success, message = self.compress_model(prototypes)
+            if not success:
+                return False, message
+            return True, f"Training completed. Total images: {count}. {message}"
+        
+        report("sections")
+        sections = self.build_section_models(recognizer)
+        if sections:
+            return True, f"Training completed. Total images: {count}. Section models: {sections}"
+        return True, f"Training completed. Total images: {count}"
+    
+    def start_training_job(self, prototypes=None):
+        """Train in a separate process, returns a TrainingJob to poll for progress or cancel"""
+        job = training_job.TrainingJob(prototypes=prototypes)
+        job.start()
+        return job
+    
+    def build_section_models(self, recognizer=None):
+        """Write a roster-only model for every registered section, returns how many were written"""
+        registry = model_shards.SectionRegistry(self.training_label_path)
+        if not registry.names():
+            return 0
+        if recognizer is None:
+            recognizer = self.get_recognizer()
+            if recognizer is None:
+                return 0
+        serials = model_shards.load_serials(os.path.join(self.student_details_path, "StudentDetails.csv"))
+        written = model_shards.write_shards(registry, recognizer, serials)
+        for name, samples in written.items():
+            print(f"Section {name}: {samples} samples")
+        return len(written)
+    
+    def set_section_roster(self, section, student_ids):
+        """Register or replace a section roster and rebuild its model"""
+        try:
+            registry = model_shards.SectionRegistry(self.training_label_path)
+            registry.set_section(section, student_ids)
+            registry.save()
+            self.build_section_models()
+            return True, f"Section {section}: {len(registry.roster(section))} students"
+        except Exception as e:
+            return False, f"Saving section failed: {str(e)}"
+    
+    def normalize_training_images(self, backup_dir=None):
+        """Convert existing training images to normalized face crops (retrain afterwards)"""
+        try:
+            counts = face_normalizer.migrate_training_images(self.training_image_path,
+                                                             self.get_face_normalizer(), backup_dir)
+        except Exception as e:
+            return False, f"Normalizing training images failed: {str(e)}"
+        message = (f"Normalized {counts['converted']} images, {counts['skipped']} already normalized, "
+                   f"{counts['failed']} failed")
+        print(message)
+        return counts['failed'] == 0, message
+    
+    def compress_model(self, prototypes_per_student=5, holdout=0.2):
+        """Reduce the trained model to a few prototype histograms per student"""
+        model_path = os.path.join(self.training_label_path, "Trainer.yml")
+        if not os.path.isfile(model_path):
+            return False, "No trained model found. Please train first."
+        
+        try:
+            print(f"Compressing model to {prototypes_per_student} prototypes per student...")
+            report = model_compression.compress_model(model_path,
+                                                      prototypes_per_label=prototypes_per_student,
+                                                      holdout=holdout)
+            message = model_compression.format_report(report)
+            print(message)
+            self.build_section_models()
+            return True, message
+        except Exception as e:
+            return False, f"Compression failed: {str(e)}"
+    
     def load_student_details(self):
         """Load student details from CSV"""
         student_file = os.path.join(self.student_details_path, "StudentDetails.csv")
@@ -456,55 +720,109 @@ class AttendanceBackend:
                 return None
         return None
     
-    def take_attendance_internal(self):
-        """Take attendance using face recognition"""
+    def take_attendance_internal(self, profile=None, section=None, preview=None):
+        """Take attendance using face recognition (profile=True records per-stage timings)
+
+        Frames are shown in preview (a live_preview.LivePreview) when given,
+        otherwise in a cv2 window.
+        """
         if not self.check_haarcascade_file():
             return False, "Haarcascade file missing", []
         
-        # Load trained model
-        model_path = os.path.join(self.training_label_path, "Trainer.yml")
-        if not os.path.isfile(model_path):
-            return False, "No trained model found. Please train first.", []
-        
+        # Load trained model (cached between sessions, binary format when available),
+        # only the section's roster when a section is set
+        section = section or self.section
         try:
-            recognizer = cv2.face.LBPHFaceRecognizer_create()
-            recognizer.read(model_path)
+            recognizer = self.get_recognizer(section)
         except Exception as e:
             return False, f"Error loading model: {e}", []
+        if recognizer is None:
+            return False, "No trained model found. Please train first.", []
         
         # Load student details
         df = self.load_student_details()
         if df is None:
             return False, "Student details missing", []
         
-        face_cascade = cv2.CascadeClassifier(self.haarcascade_path)
-        cam = cv2.VideoCapture(0)
-        
+        face_cascade = self.get_face_detector()
+        normalizer = self.get_face_normalizer()
+        cam = self.acquire_camera("attendance")
+        if cam is None:
+            return False, "Camera is busy with another job", []
         if not cam.isOpened():
+            cam.release()
             return False, "Camera not accessible", []
         
         attendance = []
         recognized_ids = set()
-        font = cv2.FONT_HERSHEY_SIMPLEX
+        
+        if profile is None:
+            profile = self.profile_sessions
+        profiler = frame_profiler.FrameProfiler(enabled=profile, metadata={
+            'camera': str(self.camera_source),
+            'section': section,
+            'frame_width': cam.get(cv2.CAP_PROP_FRAME_WIDTH),
+            'frame_height': cam.get(cv2.CAP_PROP_FRAME_HEIGHT),
+            'scale_factor': 1.2,
+            'min_neighbors': 5,
+            'model_samples': len(recognizer.labels),
+        })
+        
+        # Detect every few frames and reuse recent results to stay within the latency budget
+        scheduler = frame_scheduler.FrameScheduler(source_fps=cam.get(cv2.CAP_PROP_FPS), live=cam.live)
+        faces, predictions = [], []
         
         print("Taking attendance... Press 'q' to quit")
         
         try:
             start_time = time.time()
             while True:
-                ret, frame = cam.read()
+                plan = scheduler.plan()
+                profiler.start_frame()
+                with profiler.stage("capture"):
+                    # Frames that piled up while the last one was processed
+                    for _ in range(plan.drop):
+                        cam.grab()
+                    ret, frame = cam.read()
                 if not ret:
                     break
                 
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, 1.2, 5)
-                
-                for (x, y, w, h) in faces:
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                if plan.detect:
+                    with profiler.stage("grayscale"):
+                        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    detect_start = time.perf_counter()
+                    with profiler.stage("detect"):
+                        faces = face_cascade.detectMultiScale(gray, 1.2, 5)
+                    scheduler.record("detect", time.perf_counter() - detect_start)
                     
-                    try:
-                        serial, conf = recognizer.predict(gray[y:y + h, x:x + w])
+                    # Match the faces not already recognized on recent frames against the model in one batch
+                    predict_start = time.perf_counter()
+                    with profiler.stage("predict"):
+                        crops = normalizer.crops(gray, faces)
+                        signatures = [frame_dedup.dhash(crop) for crop in crops]
+                        predictions, pending = scheduler.match(faces, signatures)
+                        try:
+                            results = recognizer.predict_batch([crops[i] for i in pending])
+                        except Exception as e:
+                            print(f"Recognition error: {e}")
+                            results = [None] * len(pending)
+                    scheduler.record("predict", time.perf_counter() - predict_start)
+                    for i, result in zip(pending, results):
+                        predictions[i] = result
+                    scheduler.remember(faces, predictions, signatures)
+                    # Only a fresh prediction marks attendance, never one reused from a tracked face
+                    fresh = set(pending)
+                else:
+                    fresh = set()
+                
+                with profiler.stage("draw"):
+                    overlays = []
+                    for i, (box, prediction) in enumerate(zip(faces, predictions)):
+                        if prediction is None:
+                            overlays.append((box, "Error", (0, 0, 255)))
+                            continue
                         
+                        serial, conf = prediction
                         if conf < 60:  # Increased threshold for better accuracy
                             # Get student details
                             student_data = df.loc[df['SERIAL NO.'] == serial]
@@ -512,7 +830,7 @@ class AttendanceBackend:
                                 name = student_data['NAME'].iloc[0]
                                 student_id = student_data['ID'].iloc[0]
                                 
-                                if str(student_id) not in recognized_ids:
+                                if i in fresh and str(student_id) not in recognized_ids:
                                     ts = time.time()
                                     date = datetime.datetime.fromtimestamp(ts).strftime('%d-%m-%Y')
                                     timestamp = datetime.datetime.fromtimestamp(ts).strftime('%I:%M:%S %p')
@@ -528,29 +846,47 @@ class AttendanceBackend:
                                     
                                     print(f"Recognized: {name} ({student_id})")
                                 
-                                cv2.putText(frame, f"{name} ({conf:.0f}%)", (x, y-10), font, 0.8, (0, 255, 0), 2)
+                                overlays.append((box, f"{name} ({conf:.0f}%)", (0, 255, 0)))
                             else:
-                                cv2.putText(frame, f"Unknown ({conf:.0f}%)", (x, y-10), font, 0.8, (0, 0, 255), 2)
+                                overlays.append((box, f"Unknown ({conf:.0f}%)", (0, 0, 255)))
                         else:
-                            cv2.putText(frame, "Unknown", (x, y-10), font, 0.8, (0, 0, 255), 2)
+                            overlays.append((box, "Unknown", (0, 0, 255)))
                     
-                    except Exception as e:
-                        print(f"Recognition error: {e}")
-                        cv2.putText(frame, "Error", (x, y-10), font, 0.8, (0, 0, 255), 2)
-                
-                # Show status
-                cv2.putText(frame, f"Recognized: {len(recognized_ids)} students", (10, 30), 
-                           font, 0.7, (255, 255, 255), 2)
-                cv2.putText(frame, "Press 'q' to quit", (10, 60), font, 0.7, (255, 255, 255), 2)
+                    # Show status
+                    status = [f"Recognized: {len(recognized_ids)} students"]
+                    
+                    # Live FPS and stage latencies when profiling
+                    overlay = profiler.overlay_lines()
+                    if overlay:
+                        overlay.append(scheduler.overlay_line())
+                    if preview is None:
+                        status.append("Press 'q' to quit")
+                        frame_overlays.draw_overlays(frame, overlays, status, overlay)
+                    else:
+                        status.extend(overlay)
                 
-                cv2.imshow('Taking Attendance', frame)
+                with profiler.stage("display"):
+                    # The embedded preview redraws on its own schedule, only the newest frame
+                    if preview is not None:
+                        preview.show(frame, overlays, status)
+                        stop = preview.stop_requested()
+                    else:
+                        cv2.imshow('Taking Attendance', frame)
+                        stop = cv2.waitKey(1) & 0xFF == ord('q')
+                profiler.end_frame(faces=len(faces), detected=int(plan.detect), dropped=plan.drop)
+                scheduler.end_frame(plan.detect)
                 
                 # Auto-quit after 30 seconds or manual quit
-                if cv2.waitKey(1) & 0xFF == ord('q') or (time.time() - start_time) > 30:
+                if stop or (time.time() - start_time) > 30:
                     break
             
             cam.release()
-            cv2.destroyAllWindows()
+            if preview is None:
+                cv2.destroyAllWindows()
+            profiler.metadata['scheduler'] = scheduler.stats()
+            if preview is not None:
+                profiler.metadata['preview'] = preview.stats()
+            self.save_session_profile(profiler)
             
             # Save attendance
             if attendance:
@@ -561,8 +897,78 @@ class AttendanceBackend:
                 
         except Exception as e:
             cam.release()
-            cv2.destroyAllWindows()
+            if preview is None:
+                cv2.destroyAllWindows()
+            self.save_session_profile(profiler)
+            return False, f"Error taking attendance: {str(e)}", []
+    
+    def take_attendance_multi(self, sources=None, duration=30, workers=None, display=True, section=None):
+        """Take attendance from several cameras at once into one deduplicated roster"""
+        if not self.check_haarcascade_file():
+            return False, "Haarcascade file missing", []
+        
+        section = section or self.section
+        try:
+            recognizer = self.get_recognizer(section)
+        except Exception as e:
+            return False, f"Error loading model: {e}", []
+        if recognizer is None:
+            return False, "No trained model found. Please train first.", []
+        
+        df = self.load_student_details()
+        if df is None:
+            return False, "Student details missing", []
+        
+        # Serial number -> (ID, name), first row wins like the single camera lookup
+        students = {}
+        for row in df.to_dict('records'):
+            students.setdefault(int(row['SERIAL NO.']), (str(row['ID']), str(row['NAME'])))
+        
+        cams = []
+        for spec in sources or self.camera_sources:
+            # The main camera is shared with other jobs through the camera manager
+            if str(spec) == str(self.camera_source):
+                cam = self.acquire_camera("attendance")
+                if cam is None:
+                    print(f"Camera {spec} is busy, skipping")
+                    continue
+            else:
+                cam = frame_source.open_frame_source(spec)
+            if cam.isOpened():
+                cams.append(cam)
+            else:
+                cam.release()
+                print(f"Camera {spec} not accessible, skipping")
+        if not cams:
+            return False, "Camera not accessible", []
+        
+        print(f"Taking attendance on {len(cams)} cameras... Press 'q' to quit")
+        session = multi_camera.MultiCameraSession(cams, recognizer, self.haarcascade_path, students,
+                                                  threshold=60, workers=workers,
+                                                  normalizer=self.get_face_normalizer())
+        try:
+            attendance = session.run(duration=duration, display=display)
+        except Exception as e:
+            session.stop()
             return False, f"Error taking attendance: {str(e)}", []
+        
+        for camera in session.summary()['cameras']:
+            print(f"{camera['source']}: {camera['frames']} frames, {camera['fps']:.1f} FPS, "
+                  f"{camera['dropped_frames']} dropped")
+        
+        if attendance:
+            self.save_attendance(attendance)
+            return True, f"{len(attendance)} students marked present", attendance
+        return True, "No students recognized", []
+    
+    def save_session_profile(self, profiler):
+        """Write the attendance session profile, if profiling was enabled"""
+        try:
+            path = profiler.write_report(self.profile_path)
+            if path:
+                print(f"Session profile saved to: {path}")
+        except Exception as e:
+            print(f"Error saving session profile: {e}")
     
     def save_attendance(self, attendance_data):
         """Save attendance data to CSV"""
@@ -586,22 +992,37 @@ class AttendanceBackend:
         
         df_combined.to_csv(attendance_file, index=False)
         print(f"Attendance saved to: {attendance_file}")
+        
+        try:
+            self.get_aggregates().record(attendance_data)
+        except Exception as e:
+            print(f"Error updating attendance aggregates: {e}")
+    
+    def get_aggregates(self):
+        """Per-student and per-day attendance totals kept up to date by save_attendance"""
+        return attendance_aggregates.aggregates_for(self.attendance_path)
+    
+    def get_attendance_summary(self):
+        """Days present, first and last seen and attendance percentage of every student"""
+        try:
+            return self.get_aggregates().students()
+        except Exception as e:
+            print(f"Error reading attendance aggregates: {e}")
+            return []
     
     def get_today_attendance(self):
         """Get today's attendance data"""
         ts = time.time()
-        date = datetime.datetime.fromtimestamp(ts).strftime('%d-%m-%Y')
-        attendance_file = os.path.join(self.attendance_path, f"Attendance_{date}.csv")
-        
-        if os.path.isfile(attendance_file):
-            try:
-                df = pd.read_csv(attendance_file)
-                return df.to_dict('records')
-            except Exception as e:
-                print(f"Error reading attendance file: {e}")
-                return []
-        
-        return []
+        today = datetime.datetime.fromtimestamp(ts)
+        date = today.strftime('%d-%m-%Y')
+        try:
+            # Same shape as the rows save_attendance writes
+            return [{'id': record['id'], 'name': record['name'], 'date': date,
+                     'time': datetime.datetime.strptime(record['time'], '%H:%M:%S').strftime('%I:%M:%S %p')}
+                    for record in self.get_aggregates().day(today.date().isoformat())]
+        except Exception as e:
+            print(f"Error reading attendance aggregates: {e}")
+            return []
     
     def get_total_registrations(self):
         """Get total number of registrations"""
@@ -628,6 +1049,12 @@ class AttendanceBackend:
         if not os.path.exists(attendance_file):
             return False, "No attendance data available for the specified date"
         
+        import smtplib
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        from email.mime.base import MIMEBase
+        from email import encoders
+        
         try:
             # Email configuration - UPDATE THESE WITH YOUR ACTUAL EMAIL CREDENTIALS
             sender_email = "heshaikayanro@gmail.com"  # CHANGE THIS TO YOUR EMAIL
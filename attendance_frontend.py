@@ -1,23 +1,37 @@
+from fast_start import STARTUP_TIMER, fast_start_enabled, startup_report_enabled
+
+import os
+import sys
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox as mess
 from tkinter import PhotoImage
-from PIL import Image, ImageTk
 import tkinter.simpledialog as tsd
-import cv2
 import datetime
 import time
 import threading
 
 from attendance_backend import AttendanceBackend
+import training_job
+import live_preview
 
 class AttendanceFrontend:
-    def __init__(self):
-        self.backend = AttendanceBackend()
-        self.setup_window()
-        self.create_widgets()
-        self.setup_validation()
-        self.load_initial_data()
+    def __init__(self, fast_start=None):
+        # Fast start: defer the background image and preload models once the window is up
+        self.fast_start = fast_start_enabled() if fast_start is None else fast_start
+        
+        with STARTUP_TIMER.phase("backend init"):
+            self.backend = AttendanceBackend()
+        self.training_job = None
+        with STARTUP_TIMER.phase("window setup"):
+            self.setup_window()
+        with STARTUP_TIMER.phase("create widgets"):
+            self.create_widgets()
+            self.setup_validation()
+        if not self.fast_start:
+            self.load_initial_data()
+        
+        self.window.after_idle(self.on_window_ready)
         
     def setup_window(self):
         """Setup main window"""
@@ -31,15 +45,62 @@ class AttendanceFrontend:
         self.style.theme_use('clam')
         self.configure_styles()
         
-        # Try to load background image
+        self.window.configure(background='#f0f0f0')
+        if not self.fast_start:
+            self.show_background(self.load_background_image())
+    
+    def load_background_image(self):
+        """Decode the background image (safe to call off the main thread)"""
+        try:
+            from PIL import Image
+            with STARTUP_TIMER.phase("decode background image"):
+                bg_image = Image.open("background_image1.png")
+                bg_image.load()
+            return bg_image
+        except Exception as e:
+            print(f"Background image not loaded: {e}")
+            return None
+    
+    def show_background(self, bg_image):
+        """Place the decoded background image behind all widgets"""
+        if bg_image is None:
+            return
         try:
-            bg_image = Image.open("background_image1.png")
-            bg_photo = ImageTk.PhotoImage(bg_image)
-            background_label = tk.Label(self.window, image=bg_photo)
-            background_label.place(x=0, y=0, relwidth=1, relheight=1)
-            background_label.image = bg_photo  # Keep a reference
-        except:
-            self.window.configure(background='#f0f0f0')
+            from PIL import ImageTk
+            with STARTUP_TIMER.phase("show background image"):
+                bg_photo = ImageTk.PhotoImage(bg_image)
+                background_label = tk.Label(self.window, image=bg_photo)
+                background_label.place(x=0, y=0, relwidth=1, relheight=1)
+                background_label.image = bg_photo  # Keep a reference
+                background_label.lower()
+        except Exception as e:
+            print(f"Background image not shown: {e}")
+    
+    def on_window_ready(self):
+        """Finish startup in the background once the window is visible"""
+        STARTUP_TIMER.mark("window ready")
+        if not self.fast_start:
+            self.on_startup_complete()
+            return
+        
+        thread = threading.Thread(target=self.background_startup_thread, name="startup-preload")
+        thread.daemon = True
+        thread.start()
+    
+    def background_startup_thread(self):
+        """Import heavy modules, decode the background and preload models off the main thread"""
+        self.backend.preload_modules()
+        self.window.after(0, self.load_initial_data)
+        bg_image = self.load_background_image()
+        self.window.after(0, self.show_background, bg_image)
+        self.backend.preload_models()
+        self.window.after(0, self.on_startup_complete)
+    
+    def on_startup_complete(self):
+        """Print the startup timing report when requested"""
+        STARTUP_TIMER.mark("startup complete")
+        if startup_report_enabled():
+            print(STARTUP_TIMER.report())
     
     def configure_styles(self):
         """Configure theme styles"""
@@ -245,10 +306,14 @@ class AttendanceFrontend:
     
     def create_right_panel(self):
         """Create right panel with attendance records"""
+        # Camera preview, shown above the records while capturing or taking attendance
+        self.preview = live_preview.LivePreview(self.right_panel)
+        
         # Title
         title_label = tk.Label(self.right_panel, text="Attendance Records", 
                               bg="#f0f0f0", fg="#333333", font=('Helvetica', 16, 'bold'))
         title_label.pack(pady=10)
+        self.records_title = title_label
         
         # Control frame
         control_frame = tk.Frame(self.right_panel, bg="#f0f0f0")
@@ -354,8 +419,9 @@ class AttendanceFrontend:
     
     def load_initial_data(self):
         """Load initial data"""
-        self.update_registration_count()
-        self.refresh_records()
+        with STARTUP_TIMER.phase("load initial data"):
+            self.update_registration_count()
+            self.refresh_records()
     
     def update_registration_count(self):
         """Update registration count"""
@@ -375,6 +441,16 @@ class AttendanceFrontend:
         self.txt2.delete(0, 'end')
         self.takeImg.config(state='disabled')
     
+    def show_preview(self, title):
+        """Show the camera preview above the attendance records"""
+        self.preview.pack(before=self.records_title, pady=5)
+        self.preview.start(title)
+    
+    def hide_preview(self):
+        """Hide the camera preview once its session is over"""
+        self.preview.finish()
+        self.preview.pack_forget()
+    
     def take_images(self):
         """Take images for face recognition"""
         student_id = self.txt.get().strip()
@@ -400,6 +476,7 @@ class AttendanceFrontend:
             
             # Disable button during image capture
             self.takeImg.config(state='disabled')
+            self.show_preview(f"Capturing images for {student_name}")
             
             # Start image capture in separate thread
             thread = threading.Thread(target=self.capture_images_thread, 
@@ -408,13 +485,14 @@ class AttendanceFrontend:
             thread.start()
             
         except Exception as e:
+            self.hide_preview()
             mess.showerror('Error', f'Failed to start image capture: {str(e)}')
             self.takeImg.config(state='normal')
     
     def capture_images_thread(self, student_id, student_name):
         """Capture images in separate thread"""
         try:
-            success = self.backend.capture_images(student_id, student_name)
+            success = self.backend.capture_images(student_id, student_name, self.preview)
             
             # Update UI in main thread
             self.window.after(0, self.on_capture_complete, success, student_id, student_name)
@@ -424,6 +502,7 @@ class AttendanceFrontend:
     
     def on_capture_complete(self, success, student_id, student_name):
         """Handle image capture completion"""
+        self.hide_preview()
         if success:
             self.message1.config(text="Images captured successfully! Now click 'Save Profile'")
             self.trainImg.config(state='normal')
@@ -436,6 +515,7 @@ class AttendanceFrontend:
     
     def on_capture_error(self, error_msg):
         """Handle image capture error"""
+        self.hide_preview()
         self.message1.config(text="Error during image capture")
         mess.showerror('Error', f'Image capture failed: {error_msg}')
         self.takeImg.config(state='normal')
@@ -446,25 +526,50 @@ class AttendanceFrontend:
             self.message1.config(text="Training model... Please wait")
             self.window.update()
             
-            self.trainImg.config(state='disabled')
-            
-            # Start training in separate thread
-            thread = threading.Thread(target=self.train_model_thread)
-            thread.daemon = True
-            thread.start()
+            # Train in a worker process; the button cancels it meanwhile
+            self.training_job = self.backend.start_training_job()
+            self.trainImg.config(text="Cancel", command=self.cancel_training)
+            self.window.after(100, self.poll_training)
             
         except Exception as e:
             mess.showerror('Error', f'Failed to start training: {str(e)}')
             self.trainImg.config(state='normal')
     
-    def train_model_thread(self):
-        """Train model in separate thread"""
+    def cancel_training(self):
+        """Ask the running training job to stop"""
+        if self.training_job is not None:
+            self.training_job.cancel()
+            self.message1.config(text="Cancelling training...")
+            self.trainImg.config(state='disabled')
+    
+    def poll_training(self):
+        """Show training progress and finish up when the job is done"""
+        job = self.training_job
+        if job is None:
+            return
         try:
-            success = self.backend.train_model()
-            self.window.after(0, self.on_training_complete, success)
-            
+            for event in job.poll():
+                if event['type'] == 'progress':
+                    self.message1.config(text=training_job.describe(event))
         except Exception as e:
-            self.window.after(0, self.on_training_error, str(e))
+            self.training_job = None
+            self.trainImg.config(text="Save Profile", command=self.save_profile)
+            self.on_training_error(str(e))
+            return
+        
+        if not job.done():
+            self.window.after(100, self.poll_training)
+            return
+        
+        self.training_job = None
+        self.trainImg.config(text="Save Profile", command=self.save_profile)
+        success, message = job.result
+        if job.cancelled():
+            self.message1.config(text="Training cancelled. The previous model is still in use.")
+            self.trainImg.config(state='normal')
+            return
+        print(message)
+        self.on_training_complete(success)
     
     def on_training_complete(self, success):
         """Handle training completion"""
@@ -492,18 +597,25 @@ class AttendanceFrontend:
     def take_attendance(self):
         """Take attendance using face recognition"""
         try:
+            # Multi-camera sessions keep one cv2 window per camera
+            preview = None
+            if len(self.backend.camera_sources) == 1:
+                preview = self.preview
+                self.show_preview("Taking Attendance")
+            
             # Start attendance in separate thread
-            thread = threading.Thread(target=self.attendance_thread)
+            thread = threading.Thread(target=self.attendance_thread, args=(preview,))
             thread.daemon = True
             thread.start()
             
         except Exception as e:
+            self.hide_preview()
             mess.showerror('Error', f'Failed to start attendance: {str(e)}')
     
-    def attendance_thread(self):
+    def attendance_thread(self, preview=None):
         """Take attendance in separate thread"""
         try:
-            success = self.backend.take_attendance()
+            success = self.backend.take_attendance(preview)
             self.window.after(0, self.on_attendance_complete, success)
             
         except Exception as e:
@@ -511,6 +623,7 @@ class AttendanceFrontend:
     
     def on_attendance_complete(self, success):
         """Handle attendance completion"""
+        self.hide_preview()
         if success:
             mess.showinfo('Success', 'Attendance taken successfully!')
             self.refresh_records()
@@ -519,6 +632,7 @@ class AttendanceFrontend:
     
     def on_attendance_error(self, error_msg):
         """Handle attendance error"""
+        self.hide_preview()
         mess.showerror('Error', f'Attendance failed: {error_msg}')
     
     def refresh_records(self):
@@ -649,6 +763,12 @@ class AttendanceFrontend:
 # Main execution
 if __name__ == "__main__":
     try:
+        if "--startup-report" in sys.argv:
+            os.environ["ATTENDANCE_STARTUP_REPORT"] = "1"
+        if "--no-fast-start" in sys.argv:
+            os.environ["ATTENDANCE_FAST_START"] = "0"
+        if "--profile" in sys.argv:
+            os.environ["ATTENDANCE_PROFILE"] = "1"
         app = AttendanceFrontend()
         app.run()
     except Exception as e:
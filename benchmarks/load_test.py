@@ -0,0 +1,364 @@
+import argparse
+import base64
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import cv2
+import numpy as np
+
+import synthetic_data
+from run_benchmarks import summarize, quiet
+
+ROUTES = ('receive_image', 'receive_face', 'stream')
+
+
+def prepare_workdir(workdir, students, samples, frames, seed):
+    """Synthetic enrollment, a trained model and recorded frames in the app's layout"""
+    synthetic_data.generate_enrollment(workdir, students, samples, seed)
+    synthetic_data.generate_frames(workdir, students, frames, seed)
+    shutil.copy(os.path.join(REPO_ROOT, "haarcascade_frontalface_default.xml"), workdir)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from attendance_backend import AttendanceBackend
+        with quiet():
+            success, message = AttendanceBackend().train_images()
+        if not success:
+            raise RuntimeError(message)
+    finally:
+        os.chdir(previous_dir)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, port, dedup_window=None, timeout=60):
+    """Run flask_server.py in its own process on localhost, returns the process once it answers /test"""
+    log = open(os.path.join(workdir, "server.log"), "w")
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    if dedup_window is not None:
+        env["ATTENDANCE_DEDUP_WINDOW"] = str(dedup_window)
+    process = subprocess.Popen(
+        [sys.executable, "-c",
+         f"import flask_server; flask_server.app.run(host='127.0.0.1', port={port}, threaded=True)"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}, see {log.name}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/test")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not start within {timeout}s, see {log.name}")
+
+
+def load_corpus(directory):
+    """Recorded JPEG frames as raw bytes, in file order"""
+    files = sorted(f for f in os.listdir(directory) if f.lower().endswith(('.jpg', '.jpeg')))
+    if not files:
+        raise RuntimeError(f"No JPEG frames in {directory}")
+    corpus = []
+    for name in files:
+        with open(os.path.join(directory, name), "rb") as f:
+            corpus.append(f.read())
+    return corpus
+
+
+def image_payloads(corpus, tenant=None, section=None):
+    """/receive_image bodies, encoded once up front so the client costs nothing per request"""
+    return [{'image': 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode(),
+             'tenant': tenant, 'section': section} for jpeg in corpus]
+
+
+def face_payloads(corpus, roi, tenant=None, section=None):
+    """/receive_face bodies: the first detected face of each frame cropped like index.html does"""
+    detector = cv2.CascadeClassifier(os.path.join(REPO_ROOT, "haarcascade_frontalface_default.xml"))
+    size = int(roi['face_size'])
+    payloads = []
+    for jpeg in corpus:
+        gray = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_GRAYSCALE)
+        faces = detector.detectMultiScale(gray, 1.2, 5)
+        if len(faces) == 0:
+            continue
+        x, y, w, h = (int(v) for v in faces[0])
+        crop = cv2.resize(gray[y:y + h, x:x + w], (size, size), interpolation=cv2.INTER_AREA)
+        payloads.append({'face': base64.b64encode(crop.tobytes()).decode(), 'width': size, 'height': size,
+                         'box': [x, y, w, h], 'tenant': tenant, 'section': section})
+    if not payloads:
+        raise RuntimeError("No faces found in the corpus for /receive_face")
+    return payloads
+
+
+class Recorder:
+    """Latencies, status counts and errors collected from every client thread"""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = {}
+        self.cached = 0
+        self._lock = threading.Lock()
+
+    def ok(self, seconds, status, cached=False):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.cached += int(cached)
+
+    def error(self, kind, seconds=None):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+            if seconds is not None:
+                self.latencies.append(seconds)
+
+    def report(self, elapsed):
+        succeeded = sum(count for status, count in self.statuses.items() if 200 <= status < 300)
+        total = sum(self.statuses.values()) + sum(self.errors.values())
+        failed = total - succeeded
+        return {'requests': total, 'succeeded': succeeded, 'failed': failed,
+                'error_rate': failed / total if total else 0.0,
+                'throughput_rps': succeeded / elapsed if elapsed else 0.0,
+                'seconds': elapsed, 'statuses': {str(k): v for k, v in sorted(self.statuses.items())},
+                'errors': self.errors, 'cached': self.cached, 'latency': summarize(self.latencies)}
+
+
+class Pacer:
+    """Hands out request slots: as fast as workers ask (rate 0) or on a fixed open-loop schedule
+
+    With a rate, latency is measured from the slot's scheduled time, so time
+    spent waiting for a free client when the server falls behind is counted
+    instead of hidden (coordinated omission).
+    """
+
+    def __init__(self, rate, duration, requests):
+        self.rate = rate
+        self.requests = requests
+        self.start = time.perf_counter()
+        self.deadline = self.start + duration if duration else None
+        self._issued = 0
+        self._lock = threading.Lock()
+
+    def next_slot(self):
+        """Scheduled start of the next request, None when the run is over"""
+        with self._lock:
+            if self.requests and self._issued >= self.requests:
+                return None
+            index = self._issued
+            self._issued += 1
+        now = time.perf_counter()
+        if self.deadline is not None and now >= self.deadline:
+            return None
+        if not self.rate:
+            return now
+        scheduled = self.start + index / self.rate
+        if self.deadline is not None and scheduled >= self.deadline:
+            return None
+        if scheduled > now:
+            time.sleep(scheduled - now)
+        return scheduled
+
+
+def run_http(url, route, payloads, concurrency, rate, duration, requests):
+    """Drive a JSON POST route from `concurrency` kiosk threads, each with its own keep-alive connection"""
+    parsed = urllib.parse.urlsplit(url)
+    recorder = Recorder()
+    pacer = Pacer(rate, duration, requests)
+
+    def kiosk(number):
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+        index = number
+        while True:
+            scheduled = pacer.next_slot()
+            if scheduled is None:
+                break
+            body = dict(payloads[index % len(payloads)], client_id=f"loadtest-{number}")
+            index += concurrency
+            try:
+                connection.request("POST", f"/{route}", json.dumps(body),
+                                   {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                data = response.read()
+                seconds = time.perf_counter() - scheduled
+                cached = response.status == 200 and b'"cached":true' in data.replace(b" ", b"")
+                recorder.ok(seconds, response.status, cached)
+            except (OSError, http.client.HTTPException) as e:
+                recorder.error(type(e).__name__, time.perf_counter() - scheduled)
+                connection.close()
+                connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+        connection.close()
+
+    threads = [threading.Thread(target=kiosk, args=(n,), daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.perf_counter() - pacer.start)
+
+
+def run_stream(url, corpus, connections, fps, duration, tenant=None, section=None):
+    """Walk-by kiosks on /stream: each sends a frame, waits for its result, at the negotiated rate"""
+    from simple_websocket import Client, ConnectionClosed
+
+    ws_url = "ws" + url[len("http"):] + "/stream"
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + (duration or 10)
+
+    def kiosk(number):
+        try:
+            ws = Client.connect(ws_url)
+        except Exception as e:
+            recorder.error(type(e).__name__)
+            return
+        try:
+            ws.send(json.dumps({'type': 'hello', 'fps': fps, 'tenant': tenant, 'section': section}))
+            config = json.loads(ws.receive(timeout=10))
+            interval = 1.0 / config['fps'] if config.get('fps') else 0.0
+            index = number
+            while time.perf_counter() < deadline:
+                sent = time.perf_counter()
+                ws.send(corpus[index % len(corpus)])
+                index += connections
+                message = json.loads(ws.receive(timeout=30) or '{}')
+                seconds = time.perf_counter() - sent
+                if message.get('type') == 'result':
+                    recorder.ok(seconds, 200)
+                else:
+                    recorder.error(message.get('error', 'no result'), seconds)
+                pause = sent + interval - time.perf_counter()
+                if pause > 0:
+                    time.sleep(pause)
+        except ConnectionClosed:
+            recorder.error("ConnectionClosed")
+        finally:
+            ws.close()
+
+    threads = [threading.Thread(target=kiosk, args=(n,), daemon=True) for n in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.perf_counter() - start)
+
+
+def format_row(route, concurrency, result):
+    latency = result['latency']
+    return (f"{route:<14} {concurrency:>5} {result['requests']:>8} {result['throughput_rps']:>9.1f} "
+            f"{latency.get('p50_ms', 0):>8.1f} {latency.get('p95_ms', 0):>8.1f} {latency.get('p99_ms', 0):>8.1f} "
+            f"{100 * result['error_rate']:>6.1f}%")
+
+
+def run(args):
+    workdir = None
+    server = None
+    url = args.url
+    try:
+        if url is None:
+            workdir = args.workdir or tempfile.mkdtemp(prefix="attendance_load_")
+            if not os.path.isfile(os.path.join(workdir, "TrainingImageLabel", "Trainer.yml")):
+                print(f"Preparing synthetic enrollment and model in {workdir}...")
+                prepare_workdir(workdir, args.students, args.samples, args.frames, args.seed)
+            port = free_port()
+            server = start_server(workdir, port, args.dedup_window)
+            url = f"http://127.0.0.1:{port}"
+            print(f"Server started on {url} (log: {os.path.join(workdir, 'server.log')})")
+        url = url.rstrip("/")
+
+        corpus = load_corpus(args.corpus or os.path.join(workdir, "frames"))
+        levels = [int(level) for level in str(args.concurrency).split(",")]
+        results = []
+        print(f"{'route':<14} {'conc':>5} {'requests':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'errors':>7}")
+        for route in args.routes.split(","):
+            if route not in ROUTES:
+                raise SystemExit(f"Unknown route {route}, expected one of {', '.join(ROUTES)}")
+            if route == 'receive_image':
+                payloads = image_payloads(corpus, args.tenant, args.section)
+            elif route == 'receive_face':
+                parsed = urllib.parse.urlsplit(url)
+                connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=10)
+                connection.request("GET", "/roi_config")
+                payloads = face_payloads(corpus, json.loads(connection.getresponse().read()),
+                                         args.tenant, args.section)
+            for concurrency in levels:
+                if route == 'stream':
+                    result = run_stream(url, corpus, concurrency, args.stream_fps, args.duration,
+                                        args.tenant, args.section)
+                else:
+                    result = run_http(url, route, payloads, concurrency, args.rate, args.duration, args.requests)
+                result.update(route=route, concurrency=concurrency, rate=args.rate)
+                results.append(result)
+                print(format_row(route, concurrency, result))
+        return {'url': url, 'corpus_frames': len(corpus), 'results': results}
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+        if workdir and not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the Flask attendance server on localhost")
+    parser.add_argument("--url", default=None,
+                        help="Server to test (default: start flask_server.py on synthetic data). Every recognized "
+                             "face writes real attendance rows and aggregates there, so this needs --allow-writes "
+                             "and --corpus")
+    parser.add_argument("--allow-writes", action="store_true",
+                        help="Accept that load testing --url marks attendance for the students in the corpus")
+    parser.add_argument("--routes", default="receive_image",
+                        help=f"Comma separated routes to drive: {', '.join(ROUTES)}")
+    parser.add_argument("--concurrency", default="1,2,4,8",
+                        help="Simultaneous kiosks, a comma separated list runs one level after another")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Total requests per second (open loop); 0 sends as fast as the kiosks get answers")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--requests", type=int, default=0, help="Stop each level after this many requests")
+    parser.add_argument("--stream-fps", type=float, default=8.0, help="Frame rate each /stream kiosk asks for")
+    parser.add_argument("--corpus", default=None, help="Directory of recorded JPEG frames (default: synthetic)")
+    parser.add_argument("--dedup-window", type=float, default=None,
+                        help="ATTENDANCE_DEDUP_WINDOW for the started server; 0 makes every frame run recognition")
+    parser.add_argument("--tenant", default=None)
+    parser.add_argument("--section", default=None)
+    parser.add_argument("--students", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=60, help="Samples per student")
+    parser.add_argument("--frames", type=int, default=50, help="Synthetic frames in the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="Server working directory to reuse")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary working directory")
+    parser.add_argument("--output", default=None, help="Also write the JSON results here")
+    args = parser.parse_args()
+    if args.url is not None:
+        if args.corpus is None:
+            parser.error("--url needs --corpus (synthetic frames are only generated for a local server)")
+        if not args.allow_writes:
+            parser.error("--url writes real attendance for everyone recognized in the corpus; "
+                         "pass --allow-writes to load test that server anyway")
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Load test results written to: {args.output}")
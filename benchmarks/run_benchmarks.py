@@ -0,0 +1,251 @@
+import argparse
+import base64
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import cv2
+import numpy as np
+
+import synthetic_data
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    if not samples:
+        return {'n': 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        'n': int(len(ms)),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'min_ms': float(ms.min()),
+        'max_ms': float(ms.max()),
+    }
+
+
+def timed(func, *args, **kwargs):
+    """Run func once, returns (seconds, result)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the app's progress prints while timing"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def load_frames(root):
+    """Recorded frames with their manifest entries, read through a replay frame source"""
+    import frame_source
+
+    manifest = synthetic_data.load_manifest(root)
+    source = frame_source.open_frame_source(os.path.join(root, "frames"), replay=True)
+    frames = []
+    for entry in manifest['frames']:
+        ok, frame = source.read()
+        if not ok:
+            raise RuntimeError(f"Could not read recorded frame {entry['file']}")
+        frames.append((entry, frame))
+    source.release()
+    return frames
+
+
+def bench_training(backend, repeat):
+    """Full retrain through AttendanceBackend.train_images()"""
+    durations = []
+    for _ in range(repeat):
+        with quiet():
+            seconds, (success, message) = timed(backend.train_images)
+        if not success:
+            raise RuntimeError(message)
+        durations.append(seconds)
+    images = len([f for f in os.listdir(backend.training_image_path) if f.endswith('.jpg')])
+    return {'images': images, 'train': summarize(durations)}
+
+
+def bench_model_load(label_path, repeat):
+    """Load time of Trainer.yml (OpenCV and LBPHMatcher) and of the binary model"""
+    from face_matcher import LBPHMatcher
+    import model_store
+
+    yml_path = os.path.join(label_path, model_store.YAML_MODEL_NAME)
+    binary_path = os.path.join(label_path, model_store.BINARY_MODEL_NAME)
+    results = {
+        'yml_bytes': os.path.getsize(yml_path),
+        'binary_bytes': os.path.getsize(binary_path),
+    }
+
+    def load_cv2():
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(yml_path)
+
+    def load_matcher(path, mmap=True):
+        matcher = LBPHMatcher()
+        matcher.read(path, mmap=mmap)
+
+    results['cv2_yml'] = summarize([timed(load_cv2)[0] for _ in range(repeat)])
+    results['matcher_yml'] = summarize([timed(load_matcher, yml_path)[0] for _ in range(repeat)])
+    results['matcher_binary_mmap'] = summarize([timed(load_matcher, binary_path)[0] for _ in range(repeat)])
+    results['matcher_binary_read'] = summarize([timed(load_matcher, binary_path, False)[0] for _ in range(repeat)])
+    return results
+
+
+def bench_frames(backend, frames):
+    """Per-frame grayscale, detect and predict latency on the recorded frames"""
+    detector = backend.get_face_detector()
+    recognizer = backend.get_recognizer()
+    normalizer = backend.get_face_normalizer()
+    gray_times, detect_times, predict_times, batch_times = [], [], [], []
+    detected = 0
+    correct = 0
+    total_faces = 0
+
+    for entry, frame in frames:
+        seconds, gray = timed(cv2.cvtColor, frame, cv2.COLOR_BGR2GRAY)
+        gray_times.append(seconds)
+        seconds, faces = timed(detector.detectMultiScale, gray, 1.2, 5)
+        detect_times.append(seconds)
+        detected += len(faces)
+
+        # Predict on the ground-truth boxes so the numbers do not depend on detector hits
+        crops = []
+        for face in entry['faces']:
+            crops.append(normalizer.crop(gray, face['box']))
+            seconds, (label, _) = timed(recognizer.predict, crops[-1])
+            predict_times.append(seconds)
+            correct += int(label == face['serial'])
+            total_faces += 1
+        batch_times.append(timed(recognizer.predict_batch, crops)[0])
+
+    return {
+        'frames': len(frames),
+        'faces': total_faces,
+        'faces_detected': detected,
+        'predict_accuracy': correct / total_faces if total_faces else 0.0,
+        'grayscale': summarize(gray_times),
+        'detect': summarize(detect_times),
+        'predict_single': summarize(predict_times),
+        'predict_batch_per_frame': summarize(batch_times),
+    }
+
+
+def bench_attendance_writes(backend, records, batch_size):
+    """Throughput of AttendanceBackend.save_attendance() in batches"""
+    rows = [{'id': f"1si00mc{i % 1000:03d}", 'name': f"student{i}", 'date': '01-01-2025',
+             'time': '09:00:00 AM'} for i in range(records)]
+    start = time.perf_counter()
+    with quiet():
+        for offset in range(0, records, batch_size):
+            backend.save_attendance(rows[offset:offset + batch_size])
+    seconds = time.perf_counter() - start
+    return {'records': records, 'batch_size': batch_size, 'seconds': seconds,
+            'records_per_second': records / seconds if seconds else 0.0}
+
+
+def bench_flask(frames, requests):
+    """Requests per second through the Flask app's /receive_image (in-process test client)"""
+    import flask_server
+
+    client = flask_server.app.test_client()
+    payloads = []
+    for _, frame in frames:
+        ok, buffer = cv2.imencode('.jpg', frame)
+        payloads.append({'image': 'data:image/jpeg;base64,' + base64.b64encode(buffer).decode()})
+
+    durations = []
+    errors = 0
+    with quiet():
+        for i in range(requests):
+            seconds, response = timed(client.post, '/receive_image', json=payloads[i % len(payloads)])
+            durations.append(seconds)
+            errors += int(response.status_code != 200)
+    total = sum(durations)
+    return {'requests': requests, 'errors': errors,
+            'requests_per_second': requests / total if total else 0.0,
+            'latency': summarize(durations)}
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="attendance_bench_")
+    previous_dir = os.getcwd()
+    results = {}
+    try:
+        synthetic_data.generate_enrollment(workdir, args.students, args.samples, args.seed)
+        synthetic_data.generate_frames(workdir, args.students, args.frames, args.seed)
+        shutil.copy(os.path.join(REPO_ROOT, "haarcascade_frontalface_default.xml"), workdir)
+        os.chdir(workdir)
+
+        from attendance_backend import AttendanceBackend
+        backend = AttendanceBackend()
+        frames = load_frames(workdir)
+
+        results['training'] = bench_training(backend, args.repeat)
+        results['model_load'] = bench_model_load(backend.training_label_path, args.repeat)
+        results['frames'] = bench_frames(backend, frames)
+        results['attendance_writes'] = bench_attendance_writes(backend, args.records, args.batch_size)
+        if not args.skip_flask:
+            results['flask'] = bench_flask(frames, args.requests)
+    finally:
+        os.chdir(previous_dir)
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'students': args.students,
+            'samples': args.samples,
+            'frames': args.frames,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+        },
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark training, model load, recognition, attendance writes and Flask")
+    parser.add_argument("--students", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=60, help="Samples per student")
+    parser.add_argument("--frames", type=int, default=50, help="Recorded test frames")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions for training and model load")
+    parser.add_argument("--records", type=int, default=1000, help="Attendance records to write")
+    parser.add_argument("--batch-size", type=int, default=10, help="Records per save_attendance() call")
+    parser.add_argument("--requests", type=int, default=200, help="Flask requests to send")
+    parser.add_argument("--skip-flask", action="store_true")
+    parser.add_argument("--workdir", default=None, help="Reuse this directory instead of a temporary one")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary working directory")
+    parser.add_argument("--output", default=None, help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark results written to: {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,138 @@
+import argparse
+import csv
+import json
+import os
+
+import cv2
+import numpy as np
+
+FACE_SIZE = 120
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+
+
+def _student_traits(seed, serial):
+    """Deterministic per-student face geometry and texture"""
+    rng = np.random.default_rng([seed, serial])
+    texture = rng.normal(0, 1, (12, 12)).astype(np.float32)
+    texture = cv2.resize(texture, (FACE_SIZE, FACE_SIZE), interpolation=cv2.INTER_CUBIC)
+    return {
+        'skin': int(rng.integers(120, 210)),
+        'head_axes': (int(rng.integers(38, 50)), int(rng.integers(48, 58))),
+        'eye_gap': int(rng.integers(16, 26)),
+        'eye_height': int(rng.integers(44, 54)),
+        'eye_size': int(rng.integers(4, 8)),
+        'nose_length': int(rng.integers(10, 20)),
+        'mouth_width': int(rng.integers(12, 24)),
+        'mouth_height': int(rng.integers(78, 88)),
+        'texture': texture * float(rng.uniform(10, 25)),
+    }
+
+
+def synthetic_face(traits, rng):
+    """Render one grayscale face sample with per-sample pose, lighting and noise"""
+    face = np.full((FACE_SIZE, FACE_SIZE), int(rng.integers(40, 90)), np.uint8)
+    center = FACE_SIZE // 2
+    skin = traits['skin']
+    cv2.ellipse(face, (center, center + 4), traits['head_axes'], 0, 0, 360, skin, -1)
+
+    eye_y = traits['eye_height']
+    for side in (-1, 1):
+        eye = (center + side * traits['eye_gap'], eye_y)
+        cv2.circle(face, eye, traits['eye_size'] + 3, min(255, skin + 40), -1)
+        cv2.circle(face, eye, traits['eye_size'], 25, -1)
+        cv2.line(face, (eye[0] - 9, eye_y - 10), (eye[0] + 9, eye_y - 12), skin - 80, 3)
+    cv2.line(face, (center, eye_y + 6), (center - 3, eye_y + 6 + traits['nose_length']), skin - 50, 2)
+    cv2.ellipse(face, (center, traits['mouth_height']), (traits['mouth_width'], 5), 0, 0, 180, skin - 90, 2)
+
+    textured = face.astype(np.float32) + traits['texture']
+
+    # Per-sample variation: small rotation/shift, brightness, contrast and sensor noise
+    angle = rng.uniform(-8, 8)
+    shift = rng.uniform(-4, 4, 2)
+    matrix = cv2.getRotationMatrix2D((center, center), angle, rng.uniform(0.95, 1.05))
+    matrix[:, 2] += shift
+    textured = cv2.warpAffine(textured, matrix, (FACE_SIZE, FACE_SIZE), borderMode=cv2.BORDER_REFLECT)
+    textured = textured * rng.uniform(0.85, 1.15) + rng.uniform(-20, 20)
+    textured += rng.normal(0, 4, textured.shape)
+    return np.clip(textured, 0, 255).astype(np.uint8)
+
+
+def generate_enrollment(root, students=10, samples=60, seed=0):
+    """Write TrainingImage/ and StudentDetails/ in the app's layout, returns the roster"""
+    image_dir = os.path.join(root, "TrainingImage")
+    details_dir = os.path.join(root, "StudentDetails")
+    os.makedirs(image_dir, exist_ok=True)
+    os.makedirs(details_dir, exist_ok=True)
+    os.makedirs(os.path.join(root, "TrainingImageLabel"), exist_ok=True)
+    os.makedirs(os.path.join(root, "Attendance"), exist_ok=True)
+
+    roster = []
+    for serial in range(1, students + 1):
+        student_id = f"1si{seed % 100:02d}mc{serial:03d}"
+        name = f"student{serial}"
+        traits = _student_traits(seed, serial)
+        rng = np.random.default_rng([seed, serial, 1])
+        for sample in range(1, samples + 1):
+            path = os.path.join(image_dir, f"{name}.{serial}.{student_id}.{sample}.jpg")
+            cv2.imwrite(path, synthetic_face(traits, rng))
+        roster.append({'SERIAL NO.': serial, 'ID': student_id, 'NAME': name})
+
+    with open(os.path.join(details_dir, "StudentDetails.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=['SERIAL NO.', 'ID', 'NAME'])
+        writer.writeheader()
+        writer.writerows(roster)
+    return roster
+
+
+def generate_frames(root, students=10, frames=50, seed=0, max_faces=3):
+    """Write recorded test frames plus a manifest of ground-truth face boxes"""
+    frame_dir = os.path.join(root, "frames")
+    os.makedirs(frame_dir, exist_ok=True)
+    rng = np.random.default_rng([seed, 2])
+    traits = {serial: _student_traits(seed, serial) for serial in range(1, students + 1)}
+    manifest = []
+
+    for index in range(frames):
+        gradient = np.linspace(rng.integers(30, 120), rng.integers(120, 220), FRAME_WIDTH, dtype=np.float32)
+        frame = np.tile(gradient, (FRAME_HEIGHT, 1)) + rng.normal(0, 6, (FRAME_HEIGHT, FRAME_WIDTH))
+        frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+        faces = []
+        slots = rng.permutation(3)[:int(rng.integers(1, max_faces + 1))]
+        for slot in slots:
+            serial = int(rng.integers(1, students + 1))
+            size = int(rng.integers(110, 170))
+            x = int(slot * FRAME_WIDTH / 3 + rng.integers(0, max(1, FRAME_WIDTH // 3 - size)))
+            y = int(rng.integers(0, FRAME_HEIGHT - size))
+            face = cv2.resize(synthetic_face(traits[serial], rng), (size, size))
+            frame[y:y + size, x:x + size] = face
+            faces.append({'serial': serial, 'box': [x, y, size, size]})
+
+        name = f"frame_{index:04d}.jpg"
+        cv2.imwrite(os.path.join(frame_dir, name), cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+        manifest.append({'file': name, 'faces': faces})
+
+    with open(os.path.join(frame_dir, "manifest.json"), "w") as f:
+        json.dump({'seed': seed, 'students': students, 'frames': manifest}, f, indent=1)
+    return manifest
+
+
+def load_manifest(root):
+    """Read the frame manifest written by generate_frames()"""
+    with open(os.path.join(root, "frames", "manifest.json")) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic enrollment dataset and test frames")
+    parser.add_argument("root", help="Output directory (laid out like the app's working directory)")
+    parser.add_argument("--students", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=60)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_enrollment(args.root, args.students, args.samples, args.seed)
+    generate_frames(args.root, args.students, args.frames, args.seed)
+    print(f"Synthetic dataset written to: {args.root}")
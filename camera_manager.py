@@ -0,0 +1,248 @@
+import collections
+import threading
+import time
+
+import frame_source
+
+# Buffered frames discarded when a live camera is handed to a new job
+FLUSH_FRAMES = 4
+
+# A frame younger than this (seconds) proves the camera healthy without touching the device
+HEALTH_MAX_AGE = 2.0
+
+
+class CameraBusy(Exception):
+    """Raised when a job asks for the camera while another job holds it"""
+
+
+class CameraLease:
+    """One job's handle on the shared camera
+
+    Reads like cv2.VideoCapture; release() ends the job but leaves the
+    device open for the next one.
+    """
+
+    def __init__(self, manager, job):
+        self.manager = manager
+        self.job = job
+        self.active = True
+        self.started_at = time.monotonic()
+
+    @property
+    def description(self):
+        return f"{self.job}@{self.manager.description}"
+
+    def isOpened(self):
+        return self.active and self.manager.is_open()
+
+    def read_timestamped(self):
+        if not self.active:
+            return False, None, None
+        return self.manager._read()
+
+    def read(self):
+        ok, frame, _ = self.read_timestamped()
+        return ok, frame
+
+    def grab(self):
+        """Skip one frame without decoding it"""
+        if not self.active:
+            return False
+        return self.manager._grab()
+
+    @property
+    def live(self):
+        return self.manager.is_live()
+
+    def get(self, prop):
+        return self.manager.get(prop)
+
+    def release(self):
+        if self.active:
+            self.active = False
+            self.manager._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class CameraManager:
+    """Long-lived owner of one frame source, shared by capture, attendance and health checks
+
+    The device is opened once and kept open. One job at a time holds it
+    through a CameraLease; other jobs are rejected or wait their turn in
+    FIFO order. Health is answered from the frames jobs already read, and
+    the device is only probed when it is idle.
+    """
+
+    def __init__(self, spec=None, **options):
+        self.spec = spec
+        self.options = options
+        self.opens = 0
+        self.frames = 0
+        self.last_frame_at = None
+        self.last_error = None
+        self._source = None
+        self._source_lock = threading.Lock()
+        self._jobs = threading.Condition()
+        self._active = None
+        self._waiting = []
+        self._frame_times = collections.deque(maxlen=30)
+
+    @property
+    def description(self):
+        return str(self.spec if self.spec is not None else frame_source.default_source_spec())
+
+    @property
+    def active_job(self):
+        lease = self._active
+        return lease.job if lease is not None else None
+
+    def _ensure_open(self):
+        """Open the source if it is not already open (caller holds the source lock)"""
+        if self._source is not None and self._source.isOpened():
+            return True
+        if self._source is not None:
+            self._source.release()
+        self._source = frame_source.open_frame_source(self.spec, **self.options)
+        self.opens += 1
+        if not self._source.isOpened():
+            self.last_error = "Camera not accessible"
+            return False
+        return True
+
+    def is_open(self):
+        source = self._source
+        return source is not None and source.isOpened()
+
+    def get(self, prop):
+        source = self._source
+        return source.get(prop) if source is not None else 0.0
+
+    def acquire(self, job, timeout=0):
+        """Start a job on the camera and return its lease
+
+        timeout=0 rejects immediately when another job holds the camera,
+        a number of seconds waits in the queue that long, None waits for
+        as long as it takes. Raises CameraBusy when the camera is not free.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+        with self._jobs:
+            self._waiting.append(ticket)
+            try:
+                while self._active is not None or self._waiting[0] is not ticket:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise CameraBusy(f"Camera is busy with {self.active_job or 'another job'}")
+                    self._jobs.wait(remaining)
+                lease = CameraLease(self, job)
+                self._active = lease
+            finally:
+                self._waiting.remove(ticket)
+                self._jobs.notify_all()
+
+        with self._source_lock:
+            was_open = self.is_open()
+            if self._ensure_open() and was_open:
+                if getattr(self._source, 'live', False):
+                    # Drop frames buffered while the camera sat idle
+                    for _ in range(FLUSH_FRAMES):
+                        self._source.grab()
+                else:
+                    # Every job sees a recording from the start
+                    self._source.open()
+        return lease
+
+    def _release(self, lease):
+        with self._jobs:
+            if self._active is lease:
+                self._active = None
+                self._jobs.notify_all()
+
+    def _read(self):
+        with self._source_lock:
+            if not self._ensure_open():
+                return False, None, None
+            ok, frame, timestamp = self._source.read_timestamped()
+            if ok:
+                now = time.monotonic()
+                self.frames += 1
+                self.last_frame_at = now
+                self._frame_times.append(now)
+            else:
+                self.last_error = "Frame read failed"
+            return ok, frame, timestamp
+
+    def _grab(self):
+        with self._source_lock:
+            if not self._ensure_open():
+                return False
+            return self._source.grab()
+
+    def is_live(self):
+        return getattr(self._source, 'live', False)
+
+    def fps(self):
+        """Frames per second delivered to jobs over the recent window"""
+        if len(self._frame_times) < 2:
+            return 0.0
+        elapsed = self._frame_times[-1] - self._frame_times[0]
+        return (len(self._frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def _probe(self):
+        """Read one frame while no job holds the camera, returns True if it worked"""
+        with self._jobs:
+            if self._active is not None or self._waiting:
+                return None
+            lease = CameraLease(self, "health")
+            self._active = lease
+        try:
+            with self._source_lock:
+                opened = self._ensure_open()
+                live = getattr(self._source, 'live', False)
+            if not opened:
+                return False
+            # Reading would consume a frame of a recording, being open is enough there
+            if not live:
+                return True
+            return self._read()[0]
+        finally:
+            lease.release()
+
+    def health(self):
+        """Camera status, answered from recent frames whenever a job is already reading them"""
+        age = None if self.last_frame_at is None else time.monotonic() - self.last_frame_at
+        if age is not None and age <= HEALTH_MAX_AGE:
+            healthy = True
+        else:
+            healthy = self._probe()
+            if healthy is None:
+                # A job holds the camera but has not read lately; do not interrupt it
+                healthy = self.is_open()
+            age = None if self.last_frame_at is None else time.monotonic() - self.last_frame_at
+        return {
+            'source': self.description,
+            'healthy': bool(healthy),
+            'open': self.is_open(),
+            'active_job': self.active_job,
+            'queued_jobs': len(self._waiting),
+            'frames': self.frames,
+            'fps': self.fps(),
+            'last_frame_age_s': age,
+            'opens': self.opens,
+            'last_error': self.last_error,
+        }
+
+    def is_healthy(self):
+        return self.health()['healthy']
+
+    def close(self):
+        """Release the device (at shutdown); the next job opens it again"""
+        with self._source_lock:
+            if self._source is not None:
+                self._source.release()
+                self._source = None
@@ -0,0 +1,123 @@
+import argparse
+import csv
+import os
+
+from file_lock import FileLock
+
+FIELDS = ['SERIAL NO.', 'ID', 'NAME']
+
+# Last serial handed out, next to StudentDetails.csv
+COUNTER_NAME = ".serial_counter"
+
+
+class EnrollmentError(ValueError):
+    """Raised when a registration cannot be committed (e.g. the ID is already enrolled)"""
+
+
+class EnrollmentService:
+    """Student registry shared by several registration desks
+
+    Serials come from a counter file bumped under a lock, so desks on
+    different machines sharing StudentDetails/ never hand out the same
+    serial. Registrations are committed by appending one row to
+    StudentDetails.csv under a second lock; the file is never rewritten.
+    Both locks are held only for a few file operations, so face capture,
+    the slow part, runs on all desks in parallel. A serial whose capture
+    is abandoned is simply never committed.
+    """
+
+    def __init__(self, student_details_path, lock_timeout=10.0):
+        self.path = student_details_path
+        self.student_file = os.path.join(student_details_path, "StudentDetails.csv")
+        self.counter_file = os.path.join(student_details_path, COUNTER_NAME)
+        self.lock_timeout = lock_timeout
+        os.makedirs(student_details_path, exist_ok=True)
+
+    def _lock(self, name):
+        return FileLock(os.path.join(self.path, name), timeout=self.lock_timeout)
+
+    def students(self):
+        """Registered rows of StudentDetails.csv"""
+        if not os.path.isfile(self.student_file):
+            return []
+        with open(self.student_file, newline='') as f:
+            return list(csv.DictReader(f))
+
+    def _max_committed_serial(self):
+        serial = 0
+        for row in self.students():
+            try:
+                serial = max(serial, int(row['SERIAL NO.']))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return serial
+
+    def next_serial(self):
+        """Serial the next allocation will return (informational, not reserved)"""
+        try:
+            with open(self.counter_file) as f:
+                last = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            last = 0
+        # Also covers registries written before the counter existed
+        return max(last, self._max_committed_serial()) + 1
+
+    def allocate_serial(self):
+        """Reserve a serial number no other desk will get"""
+        with self._lock(".serial.lock"):
+            serial = self.next_serial()
+            tmp_path = f"{self.counter_file}.tmp{os.getpid()}"
+            with open(tmp_path, "w") as f:
+                f.write(f"{serial}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.counter_file)
+        return serial
+
+    def exists(self, student_id):
+        student_id = str(student_id).strip().lower()
+        return any(str(row.get('ID', '')).strip().lower() == student_id for row in self.students())
+
+    def commit(self, serial, student_id, name):
+        """Append a registration to StudentDetails.csv, EnrollmentError if the ID or serial is taken"""
+        with self._lock(".registry.lock"):
+            for row in self.students():
+                if str(row.get('ID', '')).strip().lower() == str(student_id).strip().lower():
+                    raise EnrollmentError(f"Student ID {student_id} is already registered")
+                if str(row.get('SERIAL NO.', '')).strip() == str(serial):
+                    raise EnrollmentError(f"Serial {serial} is already registered")
+
+            new_file = not os.path.isfile(self.student_file) or os.path.getsize(self.student_file) == 0
+            missing_newline = False
+            if not new_file:
+                # A hand-edited file may lack the final newline
+                with open(self.student_file, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    missing_newline = f.read(1) != b"\n"
+            with open(self.student_file, "a", newline='') as f:
+                if missing_newline:
+                    f.write("\n")
+                writer = csv.writer(f, lineterminator="\n")
+                if new_file:
+                    writer.writerow(FIELDS)
+                writer.writerow([serial, student_id, name])
+                f.flush()
+                os.fsync(f.fileno())
+
+    def register(self, student_id, name):
+        """Allocate a serial and commit at once, for registrations without a capture step"""
+        serial = self.allocate_serial()
+        self.commit(serial, student_id, name)
+        return serial
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the shared student registry")
+    parser.add_argument("--students", default="StudentDetails", help="StudentDetails directory")
+    parser.add_argument("--next", action="store_true", help="Print the serial the next registration will get")
+    args = parser.parse_args()
+
+    service = EnrollmentService(args.students)
+    print(f"{len(service.students())} students registered")
+    if args.next:
+        print(f"Next serial: {service.next_serial()}")
@@ -0,0 +1,286 @@
+import os
+
+import cv2
+import numpy as np
+
+import model_store
+
+# OpenCV's LBPH recognizer uses DBL_MAX as "no threshold"
+DEFAULT_THRESHOLD = np.finfo(np.float64).max
+
+# Upper bound on temporary float32 elements per vectorized distance block (~64 MB)
+MAX_BLOCK_ELEMENTS = 1 << 24
+
+
+class LBPHMatcher:
+    """Vectorized LBPH face matcher - drop-in replacement for cv2.face.LBPHFaceRecognizer
+
+    All training histograms live in one contiguous float32 matrix (stored bins by
+    samples), and each query is compared against the whole matrix at once using
+    the same chi-square distance (HISTCMP_CHISQR_ALT) that OpenCV's LBPH predict
+    uses, so labels and confidence values are interchangeable with the OpenCV
+    recognizer.
+    """
+
+    def __init__(self, radius=1, neighbors=8, grid_x=8, grid_y=8, threshold=DEFAULT_THRESHOLD):
+        self._set_params(radius, neighbors, grid_x, grid_y, threshold)
+        self.set_histograms(np.empty((0, self.feature_size), np.float32), np.empty(0, np.int32))
+
+    @property
+    def feature_size(self):
+        """Length of one spatial histogram"""
+        return self.grid_x * self.grid_y * (1 << self.neighbors)
+
+    @property
+    def histograms(self):
+        """Stored histograms as a samples-by-bins view"""
+        return self.bins.T
+
+    @property
+    def nbytes(self):
+        """Memory used by the stored histograms and labels"""
+        return self.bins.nbytes + self.labels.nbytes
+
+    def empty(self):
+        """Check if the model has no training samples"""
+        return len(self.labels) == 0
+
+    def set_histograms(self, histograms, labels):
+        """Replace the stored model with precomputed histograms and labels"""
+        histograms = np.asarray(histograms, dtype=np.float32)
+        if histograms.ndim == 1:
+            histograms = histograms.reshape(-1, self.feature_size)
+        labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        if histograms.shape[0] != labels.shape[0]:
+            raise ValueError(f"Got {histograms.shape[0]} histograms but {labels.shape[0]} labels")
+        # Bins-by-samples layout so a query's populated bins are contiguous rows
+        self.set_bins(np.ascontiguousarray(histograms.T), labels)
+
+    def set_bins(self, bins, labels, sums=None):
+        """Replace the stored model with a bins-by-samples matrix (used as-is, e.g. memory-mapped)"""
+        self.bins = bins
+        self.labels = labels
+        self._histogram_sums = bins.sum(axis=0, dtype=np.float64) if sums is None else sums
+
+    def _sample_offsets(self):
+        """Precompute neighbour offsets and bilinear weights (mirrors OpenCV's elbp)"""
+        offsets = []
+        for n in range(self.neighbors):
+            x = np.float32(self.radius * np.cos(2.0 * np.pi * n / float(self.neighbors)))
+            y = np.float32(-self.radius * np.sin(2.0 * np.pi * n / float(self.neighbors)))
+            fx, fy = int(np.floor(x)), int(np.floor(y))
+            cx, cy = int(np.ceil(x)), int(np.ceil(y))
+            ty = np.float32(y - fy)
+            tx = np.float32(x - fx)
+            weights = (
+                np.float32((1 - tx) * (1 - ty)),
+                np.float32(tx * (1 - ty)),
+                np.float32((1 - tx) * ty),
+                np.float32(tx * ty),
+            )
+            offsets.append((fx, fy, cx, cy, weights))
+        return offsets
+
+    def compute_lbp(self, src):
+        """Compute the extended LBP code image of a grayscale face"""
+        src = np.asarray(src)
+        if src.ndim == 3:
+            src = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
+        r = self.radius
+        rows, cols = src.shape
+        if rows <= 2 * r or cols <= 2 * r:
+            return np.zeros((0, 0), np.int32)
+
+        def shifted(dy, dx):
+            return src[r + dy:rows - r + dy, r + dx:cols - r + dx].astype(np.float32)
+
+        center = shifted(0, 0)
+        codes = np.zeros(center.shape, np.int32)
+        eps = np.finfo(np.float32).eps
+        for n, (fx, fy, cx, cy, (w1, w2, w3, w4)) in enumerate(self._offsets):
+            t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+            bit = (t > center) | (np.abs(t - center) < eps)
+            codes |= bit.astype(np.int32) << n
+        return codes
+
+    def compute_histogram(self, src):
+        """Compute the normalized spatial LBP histogram of a grayscale face"""
+        lbp = self.compute_lbp(src)
+        num_patterns = 1 << self.neighbors
+        cells = self.grid_x * self.grid_y
+        height = lbp.shape[0] // self.grid_y
+        width = lbp.shape[1] // self.grid_x
+        if height == 0 or width == 0:
+            return np.zeros(self.feature_size, np.float32)
+
+        # Split the code image into grid cells, one row of pixels per cell
+        grid = lbp[:height * self.grid_y, :width * self.grid_x]
+        grid = grid.reshape(self.grid_y, height, self.grid_x, width).transpose(0, 2, 1, 3)
+        grid = grid.reshape(cells, height * width)
+
+        # One bincount over all cells by offsetting each cell into its own bin range
+        binned = grid + (np.arange(cells, dtype=np.int32) * num_patterns)[:, None]
+        counts = np.bincount(binned.ravel(), minlength=cells * num_patterns)
+        return counts.astype(np.float32) / np.float32(height * width)
+
+    def compute_histograms(self, faces):
+        """Compute spatial histograms for a list of faces as one matrix"""
+        histograms = np.empty((len(faces), self.feature_size), np.float32)
+        for i, face in enumerate(faces):
+            histograms[i] = self.compute_histogram(face)
+        return histograms
+
+    def train(self, faces, labels):
+        """Train the matcher, replacing any existing samples"""
+        self.set_histograms(self.compute_histograms(faces), labels)
+
+    def update(self, faces, labels):
+        """Add samples to the existing model"""
+        histograms = self.compute_histograms(faces)
+        labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        self.set_histograms(np.vstack([self.histograms, histograms]),
+                            np.concatenate([self.labels, labels]))
+
+    def distances(self, queries):
+        """Chi-square distances from each query histogram to every stored histogram
+
+        For a bin where the query is zero the chi-square term is just the stored
+        value, so the distance is rewritten as
+            sum(h) - 3 * sum(q) + 4 * sum(q^2 / (q + h))  over bins where q > 0
+        which only touches the rows of the bins-by-samples matrix that the query
+        actually populates.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.feature_size)
+        samples = len(self.labels)
+        result = np.empty((len(queries), samples), np.float64)
+
+        for row, query in enumerate(queries):
+            populated = np.flatnonzero(query)
+            values = query[populated]
+            squares = (values * values)[:, None]
+            base = self._histogram_sums - 3.0 * values.sum(dtype=np.float64)
+
+            step = max(1, MAX_BLOCK_ELEMENTS // max(1, len(populated)))
+            for start in range(0, samples, step):
+                block = self.bins[populated, start:start + step]
+                block += values[:, None]
+                np.divide(squares, block, out=block)
+                result[row, start:start + step] = base[start:start + step] + 4.0 * block.sum(axis=0, dtype=np.float64)
+
+        # The rewritten sum can dip a hair below zero for identical histograms
+        np.maximum(result, 0.0, out=result)
+        return 2.0 * result
+
+    def predict_batch(self, faces):
+        """Predict (label, confidence) for a batch of faces in one vectorized pass"""
+        if len(faces) == 0:
+            return []
+        if self.empty():
+            raise ValueError("LBPH model is not trained yet")
+        distances = self.distances(self.compute_histograms(faces))
+        best = distances.argmin(axis=1)
+        results = []
+        for row, index in enumerate(best):
+            confidence = float(distances[row, index])
+            if confidence < self.threshold:
+                results.append((int(self.labels[index]), confidence))
+            else:
+                results.append((-1, DEFAULT_THRESHOLD))
+        return results
+
+    def predict(self, src):
+        """Predict (label, confidence) for a single face"""
+        return self.predict_batch([src])[0]
+
+    @property
+    def params(self):
+        """LBPH parameters of this model"""
+        return {'radius': self.radius, 'neighbors': self.neighbors, 'grid_x': self.grid_x,
+                'grid_y': self.grid_y, 'threshold': self.threshold}
+
+    def _set_params(self, radius, neighbors, grid_x, grid_y, threshold):
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.threshold = threshold
+        self._offsets = self._sample_offsets()
+
+    def read(self, path, mmap=True):
+        """Load a binary model (.lbph) or one saved by OpenCV's LBPH recognizer (Trainer.yml)"""
+        if model_store.is_binary_model(path):
+            params, bins, labels, sums = model_store.read_binary_model(path, mmap=mmap)
+            self._set_params(**params)
+            self.set_bins(bins, labels, sums)
+            return
+
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(path)
+        self._set_params(recognizer.getRadius(), recognizer.getNeighbors(), recognizer.getGridX(),
+                         recognizer.getGridY(), recognizer.getThreshold())
+
+        histograms = recognizer.getHistograms()
+        if len(histograms) > 0:
+            histograms = np.vstack([np.asarray(h, np.float32).reshape(1, -1) for h in histograms])
+        else:
+            histograms = np.empty((0, self.feature_size), np.float32)
+        self.set_histograms(histograms, recognizer.getLabels())
+
+    def save(self, path):
+        """Save the model - binary format for .lbph paths, otherwise OpenCV's LBPH YAML format"""
+        if path.endswith(model_store.BINARY_EXTENSION):
+            model_store.write_binary_model(path, self.params, self.bins, self.labels, self._histogram_sums)
+            return
+
+        writer = YamlModelWriter(path, self.params)
+        try:
+            writer.append(self.histograms)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close(self.labels)
+
+
+class YamlModelWriter:
+    """Writes a model in OpenCV's LBPH YAML format a chunk of histograms at a time
+
+    The file is written next to the target and renamed into place on
+    close(), like binary models; FileStorage picks the format from the
+    extension, so the temporary name keeps it.
+    """
+
+    def __init__(self, path, params):
+        self.path = path
+        root, extension = os.path.splitext(path)
+        self._tmp_path = f"{root}.tmp{os.getpid()}{extension}"
+        self._fs = cv2.FileStorage(self._tmp_path, cv2.FILE_STORAGE_WRITE)
+        self._fs.startWriteStruct("opencv_lbphfaces", cv2.FILE_NODE_MAP)
+        self._fs.write("threshold", float(params['threshold']))
+        self._fs.write("radius", int(params['radius']))
+        self._fs.write("neighbors", int(params['neighbors']))
+        self._fs.write("grid_x", int(params['grid_x']))
+        self._fs.write("grid_y", int(params['grid_y']))
+        self._fs.startWriteStruct("histograms", cv2.FILE_NODE_SEQ)
+
+    def append(self, histograms):
+        for histogram in histograms:
+            self._fs.write("", np.ascontiguousarray(histogram, np.float32).reshape(1, -1))
+
+    def close(self, labels):
+        """Write the labels of every appended histogram and move the file into place"""
+        try:
+            self._fs.endWriteStruct()
+            self._fs.write("labels", np.asarray(labels, np.int32).reshape(-1, 1))
+            self._fs.startWriteStruct("labelsInfo", cv2.FILE_NODE_SEQ)
+            self._fs.endWriteStruct()
+            self._fs.endWriteStruct()
+        finally:
+            self._fs.release()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._fs.release()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,126 @@
+import argparse
+import os
+
+import cv2
+
+# Side of the square every face crop is resized to before LBP (pixels)
+FACE_SIZE = 100
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class FaceNormalizer:
+    """Turns detector crops into fixed-size grayscale faces, optionally histogram-equalized
+
+    The same normalizer must be used for capture, training and prediction;
+    changing the size or equalization means retraining the model.
+    """
+
+    def __init__(self, size=FACE_SIZE, equalize=False):
+        self.size = int(size)
+        self.equalize = bool(equalize)
+
+    def normalize(self, face):
+        """Normalize one grayscale (or BGR) face image"""
+        if face.ndim == 3:
+            face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        if face.shape[0] != self.size or face.shape[1] != self.size:
+            # INTER_AREA avoids aliasing when shrinking, linear is enough for small faces
+            shrinking = face.shape[0] > self.size or face.shape[1] > self.size
+            face = cv2.resize(face, (self.size, self.size),
+                              interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR)
+        if self.equalize:
+            face = cv2.equalizeHist(face)
+        return face
+
+    __call__ = normalize
+
+    def crop(self, gray, box):
+        """Cut a detector box (x, y, w, h) out of a grayscale frame and normalize it"""
+        x, y, w, h = (int(v) for v in box)
+        return self.normalize(gray[y:y + h, x:x + w])
+
+    def crops(self, gray, boxes):
+        return [self.crop(gray, box) for box in boxes]
+
+    def is_normalized(self, face):
+        return face.ndim == 2 and face.shape[0] == self.size and face.shape[1] == self.size
+
+    @property
+    def params(self):
+        return {'size': self.size, 'equalize': self.equalize}
+
+
+def default_normalizer():
+    """Normalizer configured for this install (ATTENDANCE_FACE_SIZE, ATTENDANCE_EQUALIZE)"""
+    size = int(os.environ.get("ATTENDANCE_FACE_SIZE", FACE_SIZE))
+    equalize = os.environ.get("ATTENDANCE_EQUALIZE", "0").strip().lower() in ("1", "true", "yes")
+    return FaceNormalizer(size, equalize)
+
+
+def migrate_training_images(directory, normalizer=None, backup_dir=None):
+    """Rewrite existing training images as normalized faces in place
+
+    Files already at the target size are left alone unless equalization is
+    on. Originals are copied to backup_dir first when one is given. Returns
+    counts of converted, skipped and failed files.
+    """
+    normalizer = normalizer or default_normalizer()
+    counts = {'converted': 0, 'skipped': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+    if backup_dir:
+        os.makedirs(backup_dir, exist_ok=True)
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        path = os.path.join(directory, filename)
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            print(f"Error reading {path}, skipping")
+            counts['failed'] += 1
+            continue
+        size_before = os.path.getsize(path)
+        counts['bytes_before'] += size_before
+        if normalizer.is_normalized(image) and not normalizer.equalize:
+            counts['skipped'] += 1
+            counts['bytes_after'] += size_before
+            continue
+
+        if backup_dir:
+            with open(path, "rb") as src, open(os.path.join(backup_dir, filename), "wb") as dst:
+                dst.write(src.read())
+        # Encoded here rather than by imwrite, so the temporary name can end in .tmp:
+        # a leftover from an interrupted run must not look like a training image
+        ok, encoded = cv2.imencode(os.path.splitext(path)[1], normalizer.normalize(image))
+        if not ok:
+            print(f"Error writing {path}, skipping")
+            counts['failed'] += 1
+            counts['bytes_after'] += size_before
+            continue
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, path)
+        counts['converted'] += 1
+        counts['bytes_after'] += os.path.getsize(path)
+
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalize existing training images to fixed-size face crops")
+    parser.add_argument("directory", nargs="?", default="TrainingImage")
+    parser.add_argument("--size", type=int, default=None, help=f"Face size in pixels (default {FACE_SIZE})")
+    parser.add_argument("--equalize", action="store_true", help="Also equalize the histogram")
+    parser.add_argument("--backup", default=None, help="Copy the original images here first")
+    args = parser.parse_args()
+
+    normalizer = default_normalizer()
+    if args.size:
+        normalizer.size = args.size
+    if args.equalize:
+        normalizer.equalize = True
+    counts = migrate_training_images(args.directory, normalizer, args.backup)
+    print(f"Converted {counts['converted']}, already normalized {counts['skipped']}, failed {counts['failed']}")
+    print(f"Size on disk: {counts['bytes_before'] / 1024:.0f} KiB -> {counts['bytes_after'] / 1024:.0f} KiB")
+    print("Retrain the model so it matches the normalized images.")
@@ -0,0 +1,85 @@
+import importlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Records how long each startup phase takes, relative to process start"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block of startup work"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def record(self, name, start, end):
+        """Record a phase that ran from start to end (perf_counter values)"""
+        with self._lock:
+            self.phases.append((name, start - self.origin, end - start, threading.current_thread().name))
+
+    def mark(self, name):
+        """Record an instant, e.g. 'window visible'"""
+        now = time.perf_counter()
+        self.record(name, now, now)
+
+    def report(self):
+        """Startup timing report, one line per phase in start order"""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        lines = ["Startup timing report", f"{'phase':<36}{'start':>10}{'duration':>12}  thread"]
+        for name, start, duration, thread in phases:
+            lines.append(f"{name:<36}{start * 1000:>8.1f}ms{duration * 1000:>10.1f}ms  {thread}")
+        lines.append(f"{'total so far':<36}{(time.perf_counter() - self.origin) * 1000:>8.1f}ms")
+        return "\n".join(lines)
+
+
+STARTUP_TIMER = StartupTimer()
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    with STARTUP_TIMER.phase(f"import {self._name}"):
+                        self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Return a proxy for a module that is imported the first time it is used"""
+    return LazyModule(name)
+
+
+def fast_start_enabled():
+    """Fast start is on unless ATTENDANCE_FAST_START is set to 0/false/no"""
+    return os.environ.get("ATTENDANCE_FAST_START", "1").strip().lower() not in ("0", "false", "no")
+
+
+def startup_report_enabled():
+    """Startup timing report is printed when ATTENDANCE_STARTUP_REPORT is set to 1/true/yes"""
+    return os.environ.get("ATTENDANCE_STARTUP_REPORT", "0").strip().lower() in ("1", "true", "yes")
@@ -0,0 +1,97 @@
+import os
+import socket
+import time
+
+
+class LockTimeout(Exception):
+    """Raised when a file lock could not be taken in time"""
+
+
+class FileLock:
+    """Cross-process lock held by creating a lock file exclusively
+
+    O_CREAT | O_EXCL is atomic on local disks and on NFS/SMB shares, so
+    processes on different machines sharing a directory can use it. A lock
+    older than stale_after seconds is assumed to belong to a crashed holder
+    and is broken. Breaking is best-effort: the owner is read again right
+    before the file is deleted, but two waiters breaking the same stale lock
+    at the same moment can still both get in. release() only removes a lock
+    that still carries this holder's owner line.
+    """
+
+    def __init__(self, path, timeout=10.0, stale_after=30.0, poll=0.01):
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll = poll
+        self._held = False
+        self._token = None
+
+    def _owner(self):
+        return f"{socket.gethostname()}:{os.getpid()}:{time.time():.3f}\n".encode()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        delay = self.poll
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._break_if_stale()
+                if time.monotonic() >= deadline:
+                    raise LockTimeout(f"Timed out waiting for {self.path}")
+                time.sleep(delay)
+                # Back off a little so many waiting processes do not hammer the share
+                delay = min(delay * 2, 0.2)
+                continue
+            self._token = self._owner()
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._token)
+            self._held = True
+            return self
+
+    def _read(self, path):
+        """(mtime, owner) of a lock file, None if it is gone"""
+        try:
+            with open(path, "rb") as f:
+                return os.fstat(f.fileno()).st_mtime, f.read()
+        except OSError:
+            return None
+
+    def _break_if_stale(self):
+        seen = self._read(self.path)
+        if seen is None:
+            return
+        age = time.time() - seen[0]
+        if age <= self.stale_after:
+            return
+        # Not atomic: narrows, but cannot close, the window in which another
+        # waiter breaks the same lock and takes a fresh one
+        if self._read(self.path) != seen:
+            return
+        print(f"Breaking stale lock {self.path} ({age:.0f}s old)")
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def release(self):
+        if self._held:
+            self._held = False
+            # A lock broken as stale while it was held may belong to someone else by now
+            current = self._read(self.path)
+            if current is None:
+                return
+            if current[1] != self._token:
+                print(f"Lock {self.path} was taken over, not removing it")
+                return
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
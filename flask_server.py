@@ -1,95 +1,416 @@
 # flask_server.py
-from flask import Flask, request, jsonify
+from fast_start import STARTUP_TIMER
+
+from flask import Flask, request, jsonify, Response
 import cv2
 import numpy as np
 import base64
 import os
 import csv
+import json
+import time
 from datetime import datetime
 from flask_cors import CORS
 
+# WebSocket streaming for kiosks is optional (pip install flask-sock)
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+import attendance_aggregates
+import face_normalizer
+import frame_dedup
+import metrics
+import query_api
+import tenant_models
+
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(query_api.blueprint)
+
+STARTUP_TIMER.mark("server imports done")
+
+# Metrics exposed on /metrics
+REQUESTS = metrics.REGISTRY.counter("attendance_requests_total", "Recognition requests by route and HTTP status", ["route", "status"])
+REQUEST_SECONDS = metrics.REGISTRY.histogram("attendance_request_seconds", "End-to-end recognition request latency", ["route"])
+STAGE_SECONDS = metrics.REGISTRY.histogram("attendance_stage_seconds", "Latency of each recognition stage", ["stage"])
+FACES_FOUND = metrics.REGISTRY.counter("attendance_faces_found_total", "Faces returned by the detector")
+RECOGNITIONS = metrics.REGISTRY.counter("attendance_recognitions_total", "Predictions by outcome", ["result"])
+ERRORS = metrics.REGISTRY.counter("attendance_errors_total", "Failed recognition requests by stage", ["stage"])
+STREAM_FRAMES = metrics.REGISTRY.counter("attendance_stream_frames_total", "Streamed kiosk frames by outcome", ["result"])
+FRAME_CACHE = metrics.REGISTRY.counter("attendance_frame_cache_total", "Repeated-frame short-circuit lookups", ["result"])
+MODEL_CACHE = metrics.REGISTRY.counter("attendance_model_cache_total", "Model cache lookups and evictions", ["result"])
 
 # Load the Haar Cascade
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-
-# Load the trained face recognizer
-recognizer = cv2.face.LBPHFaceRecognizer_create()
-trainer_path = "TrainingImageLabel/Trainer.yml"
-if not os.path.exists(trainer_path):
-    raise FileNotFoundError("Trainer.yml not found. Please run training first.")
-recognizer.read(trainer_path)
-
-# Load ID-to-name mapping from StudentDetails.csv
-label_dict = {}
-csv_path = "StudentDetails/StudentDetails.csv"
-if os.path.exists(csv_path):
-    with open(csv_path, 'r') as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip header
-        for row in reader:
-            if len(row) >= 2 and row[0].isdigit():
-                label_dict[int(row[0])] = row[1]
-else:
-    raise FileNotFoundError("StudentDetails.csv not found.")
+with STARTUP_TIMER.phase("load cascade"):
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+# Faces are normalized the same way as at capture and training time
+normalizer = face_normalizer.default_normalizer()
+
+# Models of every tenant (department) and section, loaded on first use into a size-bounded LRU cache
+DEFAULT_SECTION = os.environ.get("ATTENDANCE_SECTION", "").strip() or None
+model_cache = tenant_models.ModelCache(on_event=lambda result: MODEL_CACHE.inc(result=result))
+metrics.REGISTRY.gauge("attendance_model_cache_bytes", "Memory held by cached models", function=lambda: model_cache.bytes)
+metrics.REGISTRY.gauge("attendance_model_cache_entries", "Models in the cache", function=lambda: len(model_cache))
+
+# Kiosk streams: the server caps the frame rate and asks clients to downscale wide frames
+STREAM_MAX_FPS = float(os.environ.get("ATTENDANCE_STREAM_MAX_FPS", "10"))
+STREAM_MAX_WIDTH = 640
+STREAM_JPEG_QUALITY = 0.7
+
+# Face-only uploads: clients detect the face themselves and widen their box by this fraction
+# per side, since browser detectors crop tighter than the Haar cascade the model was trained on
+ROI_PADDING = float(os.environ.get("ATTENDANCE_ROI_PADDING", "0.1"))
+
+# Near-identical frames from the same client within this many seconds reuse the earlier
+# result (double clicks, resends) of at most this many differing hash bits out of 256;
+# 0 seconds turns the short-circuit off
+recent_frames = frame_dedup.RecentFrameCache(
+    window=float(os.environ.get("ATTENDANCE_DEDUP_WINDOW", "1.0")),
+    max_distance=int(os.environ.get("ATTENDANCE_DEDUP_DISTANCE", "8")))
+
+def client_identity(data):
+    """Who sent a request: the page's client_id when given, else the remote address, per tenant and section"""
+    client = data.get('client_id') or request.headers.get('X-Client-Id') or request.remote_addr
+    return (client, data.get('tenant'), data.get('section') or DEFAULT_SECTION)
+
+# Single-department installs keep their model in the working directory; load it up front
+with STARTUP_TIMER.phase("load model"):
+    try:
+        model_cache.get(None, DEFAULT_SECTION)
+    except (tenant_models.UnknownTenant, FileNotFoundError) as e:
+        if not os.path.isdir(tenant_models.TENANTS_DIR):
+            raise FileNotFoundError("Trainer.yml not found. Please run training first.") from e
+        print(f"No default model ({e}), serving tenants from {tenant_models.TENANTS_DIR}/ only")
+
+def write_attendance(model, id_, name):
+    """Append one attendance row to the tenant's file for today, returns (date, time)
+
+    id_ is the recognizer's label (the serial number); the row records the
+    student ID and name like the desktop app does, so both writers share
+    one attendance key per student.
+    """
+    student_id, student_name = model.students.get(id_, (id_, name))
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    time_str = datetime.now().strftime('%H:%M:%S')
+    filename = os.path.join(model.attendance_path, f"Attendance_{date_str}.csv")
+
+    if not os.path.exists(model.attendance_path):
+        os.makedirs(model.attendance_path)
+
+    file_exists = os.path.isfile(filename)
+    with open(filename, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if not file_exists:
+            writer.writerow(["ID", "Name", "Date", "Time"])
+        writer.writerow([student_id, student_name, date_str, time_str])
+    try:
+        attendance_aggregates.aggregates_for(model.attendance_path).record(
+            [{'id': student_id, 'name': student_name, 'date': date_str, 'time': time_str}])
+    except Exception as e:
+        print(f"Error updating attendance aggregates: {e}")
+    return date_str, time_str
+
+def recognize_faces(frame, model):
+    """Detect and identify every face in a BGR frame, one dict per face"""
+    with STAGE_SECONDS.time(stage="grayscale"):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    with STAGE_SECONDS.time(stage="detect"):
+        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5)
+    FACES_FOUND.inc(len(faces))
+    if len(faces) == 0:
+        return []
+
+    with STAGE_SECONDS.time(stage="predict"):
+        predictions = model.recognizer.predict_batch(normalizer.crops(gray, faces))
+    results = []
+    for (x, y, w, h), (id_raw, conf) in zip(faces, predictions):
+        recognized = conf < 70
+        RECOGNITIONS.inc(result="recognized" if recognized else "unknown")
+        results.append({
+            'box': [int(x), int(y), int(w), int(h)],
+            'id': int(id_raw) if recognized else None,
+            'name': model.label_dict.get(id_raw, f"ID_{id_raw}") if recognized else "Unknown",
+            'confidence': round(float(conf), 1),
+        })
+    return results
 
 @app.route('/receive_image', methods=['POST'])
 def receive_image():
+    stage = "parse"
     try:
-        data = request.get_json()
-        if not data or 'image' not in data:
-            return jsonify({'error': 'No image data provided'}), 400
-
-        # Decode the image from base64
-        image_data = data['image'].split(',')[1]
-        img_bytes = base64.b64decode(image_data)
-        img_array = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with REQUEST_SECONDS.time(route="/receive_image"):
+            with STAGE_SECONDS.time(stage="parse"):
+                data = request.get_json()
+            if not data or 'image' not in data:
+                REQUESTS.inc(route="/receive_image", status="400")
+                return jsonify({'error': 'No image data provided'}), 400
 
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5)
+            # Decode the image from base64
+            stage = "decode"
+            with STAGE_SECONDS.time(stage="decode"):
+                image_data = data['image'].split(',')[1]
+                img_bytes = base64.b64decode(image_data)
+                img_array = np.frombuffer(img_bytes, np.uint8)
+                frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+
+            stage = "grayscale"
+            with STAGE_SECONDS.time(stage="grayscale"):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            # A resend of a frame just handled gets the same answer without detection,
+            # prediction or another attendance row
+            stage = "dedup"
+            with STAGE_SECONDS.time(stage="dedup"):
+                client = client_identity(data)
+                frame_hash = frame_dedup.dhash(gray, frame_dedup.FRAME_HASH_SIZE)
+                cached = recent_frames.lookup(client, frame_hash)
+            if cached is not None:
+                FRAME_CACHE.inc(result="hit")
+                REQUESTS.inc(route="/receive_image", status="200")
+                return jsonify(dict(cached, cached=True)), 200
+            FRAME_CACHE.inc(result="miss")
+
+            stage = "detect"
+            with STAGE_SECONDS.time(stage="detect"):
+                faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5)
+            FACES_FOUND.inc(len(faces))
+
+            stage = "load_model"
+            with STAGE_SECONDS.time(stage="load_model"):
+                try:
+                    model = model_cache.get(data.get('tenant'), data.get('section') or DEFAULT_SECTION)
+                except tenant_models.UnknownTenant as e:
+                    REQUESTS.inc(route="/receive_image", status="404")
+                    return jsonify({'error': str(e)}), 404
 
-        id_ = "Unknown"
-        name = "Unknown"
-        confidence = 1000
+            id_ = "Unknown"
+            name = "Unknown"
+            confidence = 1000
 
-        for (x, y, w, h) in faces:
-            id_raw, conf = recognizer.predict(gray[y:y+h, x:x+w])
+            stage = "predict"
+            for (x, y, w, h) in faces:
+                with STAGE_SECONDS.time(stage="predict"):
+                    id_raw, conf = model.recognizer.predict(normalizer.crop(gray, (x, y, w, h)))
+                print(f"Prediction: ID={id_raw}, Confidence={conf:.2f}")
+                if conf < 70:
+                    id_ = id_raw
+                    name = model.label_dict.get(id_, f"ID_{id_}")
+                    confidence = conf
+                    RECOGNITIONS.inc(result="recognized")
+                else:
+                    name = "Unknown"
+                    RECOGNITIONS.inc(result="unknown")
+                break  # Process only one face
+
+            # Write attendance
+            stage = "attendance_write"
+            with STAGE_SECONDS.time(stage="attendance_write"):
+                date_str, time_str = write_attendance(model, id_, name)
+
+        REQUESTS.inc(route="/receive_image", status="200")
+        print(f"📝 Attendance marked: {id_}, {name}, {date_str}, {time_str}")
+        result = {"message": f"Attendance marked for {name}"}
+        recent_frames.store(client, frame_hash, result)
+        return jsonify(result), 200
+
+    except Exception as e:
+        ERRORS.inc(stage=stage)
+        REQUESTS.inc(route="/receive_image", status="500")
+        print("❌ Error in receive_image:", e)
+        return jsonify({"message": "Internal server error"}), 500
+
+@app.route('/roi_config', methods=['GET'])
+def roi_config():
+    """What clients should send to /receive_face"""
+    return jsonify({
+        'face_size': normalizer.size,
+        'format': 'gray8',
+        'padding': ROI_PADDING,
+        'equalize': normalizer.equalize,
+    })
+
+@app.route('/receive_face', methods=['POST'])
+def receive_face():
+    """Recognize a face the client already cropped: raw 8-bit grayscale pixels plus its box
+
+    No image decode or face detection runs on the server; the crop is only
+    normalized (resized if the client sent another size) before matching.
+    """
+    stage = "parse"
+    try:
+        with REQUEST_SECONDS.time(route="/receive_face"):
+            with STAGE_SECONDS.time(stage="parse"):
+                data = request.get_json()
+            if not data or 'face' not in data:
+                REQUESTS.inc(route="/receive_face", status="400")
+                return jsonify({'error': 'No face data provided'}), 400
+
+            stage = "decode"
+            with STAGE_SECONDS.time(stage="decode"):
+                width = int(data.get('width', normalizer.size))
+                height = int(data.get('height', normalizer.size))
+                pixels = np.frombuffer(base64.b64decode(data['face']), np.uint8)
+            if width <= 0 or height <= 0 or pixels.size != width * height:
+                REQUESTS.inc(route="/receive_face", status="400")
+                return jsonify({'error': f'Expected {width}x{height} grayscale bytes, got {pixels.size}'}), 400
+            face = normalizer.normalize(pixels.reshape(height, width))
+
+            stage = "load_model"
+            with STAGE_SECONDS.time(stage="load_model"):
+                try:
+                    model = model_cache.get(data.get('tenant'), data.get('section') or DEFAULT_SECTION)
+                except tenant_models.UnknownTenant as e:
+                    REQUESTS.inc(route="/receive_face", status="404")
+                    return jsonify({'error': str(e)}), 404
+
+            stage = "predict"
+            with STAGE_SECONDS.time(stage="predict"):
+                id_raw, conf = model.recognizer.predict(face)
             print(f"Prediction: ID={id_raw}, Confidence={conf:.2f}")
+            FACES_FOUND.inc()
             if conf < 70:
                 id_ = id_raw
-                name = label_dict.get(id_, f"ID_{id_}")
-                confidence = conf
+                name = model.label_dict.get(id_, f"ID_{id_}")
+                RECOGNITIONS.inc(result="recognized")
             else:
+                id_ = "Unknown"
                 name = "Unknown"
-            break  # Process only one face
-
-        # Write attendance
-        date_str = datetime.now().strftime('%Y-%m-%d')
-        time_str = datetime.now().strftime('%H:%M:%S')
-        filename = f"Attendance/Attendance_{date_str}.csv"
+                RECOGNITIONS.inc(result="unknown")
 
-        if not os.path.exists("Attendance"):
-            os.makedirs("Attendance")
-
-        file_exists = os.path.isfile(filename)
-        with open(filename, 'a', newline='') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(["ID", "Name", "Date", "Time"])
-            writer.writerow([id_, name, date_str, time_str])
+            stage = "attendance_write"
+            with STAGE_SECONDS.time(stage="attendance_write"):
+                date_str, time_str = write_attendance(model, id_, name)
 
+        REQUESTS.inc(route="/receive_face", status="200")
         print(f"📝 Attendance marked: {id_}, {name}, {date_str}, {time_str}")
-        return jsonify({"message": f"Attendance marked for {name}"}), 200
+        return jsonify({"message": f"Attendance marked for {name}", "box": data.get('box'),
+                        "confidence": round(float(conf), 1)}), 200
 
     except Exception as e:
-        print("❌ Error in receive_image:", e)
+        ERRORS.inc(stage=stage)
+        REQUESTS.inc(route="/receive_face", status="500")
+        print("❌ Error in receive_face:", e)
         return jsonify({"message": "Internal server error"}), 500
 
+def stream_recognition(ws):
+    """Kiosk stream: a JSON hello, then binary JPEG frames; results are pushed back as JSON
+
+    Frames that arrive while one is being recognized are dropped, only the
+    newest is processed, so a slow server never builds up a backlog. Each
+    student is marked once per stream.
+    """
+    hello = ws.receive(timeout=10)
+    try:
+        hello = json.loads(hello) if isinstance(hello, str) else {}
+    except ValueError:
+        hello = {}
+    if hello.get('type') != 'hello':
+        ws.send(json.dumps({'type': 'error', 'error': 'Expected a hello message'}))
+        return
+    tenant, section = hello.get('tenant'), hello.get('section') or DEFAULT_SECTION
+    try:
+        model_cache.get(tenant, section)
+    except tenant_models.UnknownTenant as e:
+        ws.send(json.dumps({'type': 'error', 'error': str(e)}))
+        return
+
+    def negotiate(requested):
+        try:
+            requested = float(requested)
+        except (TypeError, ValueError):
+            requested = STREAM_MAX_FPS
+        fps = STREAM_MAX_FPS if requested <= 0 else min(requested, STREAM_MAX_FPS)
+        ws.send(json.dumps({'type': 'config', 'fps': fps, 'max_width': STREAM_MAX_WIDTH,
+                            'quality': STREAM_JPEG_QUALITY}))
+
+    def handle_control(message):
+        """Apply a text control message; malformed ones are answered with an error, not fatal"""
+        try:
+            control = json.loads(message)
+        except ValueError:
+            control = None
+        if not isinstance(control, dict):
+            ws.send(json.dumps({'type': 'error', 'error': 'Expected a JSON control message'}))
+            return
+        if control.get('type') == 'rate':
+            negotiate(control.get('fps'))
+
+    negotiate(hello.get('fps'))
+    marked = set()
+    processed = 0
+    dropped = 0
+
+    while True:
+        message = ws.receive()
+        if isinstance(message, str):
+            handle_control(message)
+            continue
+
+        # Keep only the newest frame that has arrived meanwhile
+        while True:
+            newer = ws.receive(timeout=0)
+            if newer is None:
+                break
+            if isinstance(newer, str):
+                handle_control(newer)
+                continue
+            dropped += 1
+            STREAM_FRAMES.inc(result="dropped")
+            message = newer
+
+        start = time.perf_counter()
+        with REQUEST_SECONDS.time(route="/stream"):
+            frame = cv2.imdecode(np.frombuffer(message, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                ERRORS.inc(stage="decode")
+                ws.send(json.dumps({'type': 'error', 'error': 'Could not decode frame'}))
+                continue
+            # A failed frame is reported like the HTTP routes would, the stream stays open
+            stage = "load_model"
+            try:
+                # Cheap cache hit per frame, but picks up retrained models mid-stream
+                model = model_cache.get(tenant, section)
+                stage = "recognize"
+                faces = recognize_faces(frame, model)
+                stage = "attendance_write"
+                for face in faces:
+                    face['marked'] = False
+                    if face['id'] is not None and face['id'] not in marked:
+                        with STAGE_SECONDS.time(stage="attendance_write"):
+                            write_attendance(model, face['id'], face['name'])
+                        marked.add(face['id'])
+                        face['marked'] = True
+                        print(f"📝 Attendance marked: {face['id']}, {face['name']}")
+            except tenant_models.UnknownTenant as e:
+                ERRORS.inc(stage=stage)
+                ws.send(json.dumps({'type': 'error', 'error': str(e)}))
+                continue
+            except Exception as e:
+                ERRORS.inc(stage=stage)
+                print("❌ Error in stream_recognition:", e)
+                ws.send(json.dumps({'type': 'error', 'error': 'Internal server error'}))
+                continue
+        processed += 1
+        STREAM_FRAMES.inc(result="processed")
+        ws.send(json.dumps({'type': 'result', 'frame': processed, 'dropped': dropped, 'faces': faces,
+                            'latency_ms': round((time.perf_counter() - start) * 1000, 1)}))
+
+if Sock is not None:
+    Sock(app).route('/stream')(stream_recognition)
+else:
+    print("flask-sock not installed, the /stream endpoint for kiosks is disabled")
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype=metrics.CONTENT_TYPE)
+
 @app.route('/test', methods=['GET'])
 def test():
     return "✅ Flask server is up and reachable!"
 
 if __name__ == '__main__':
+    print(STARTUP_TIMER.report())
     app.run(host='0.0.0.0', port=5000)
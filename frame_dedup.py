@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Frames are hashed on a 16x16 grid (256 bits): fine enough that another student stepping
+# in front of the same kiosk background moves far more bits than a resend does
+FRAME_HASH_SIZE = 16
+
+
+def dhash(gray, size=8):
+    """Difference hash of a grayscale image: signs of horizontal gradients on a (size+1)x size thumbnail"""
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class RecentFrameCache:
+    """Short-lived results of recently recognized frames, per client
+
+    A frame whose hash is within max_distance bits of one the same client
+    sent less than `window` seconds ago gets that frame's result back, so
+    a resend skips detection and prediction. Keep the distance small and
+    the window short: a hit is never re-predicted. Only the most recently
+    active max_clients clients are remembered.
+    """
+
+    def __init__(self, window=1.0, max_distance=8, max_clients=1024):
+        self.window = window
+        self.max_distance = max_distance
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, client, frame_hash, now=None):
+        """Cached result for a near-identical recent frame, None if there is none"""
+        if self.window <= 0:
+            return None
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entries = self._clients.get(client)
+            if not entries:
+                return None
+            entries[:] = [entry for entry in entries if now - entry[1] <= self.window]
+            for cached_hash, _, result in reversed(entries):
+                if hamming(cached_hash, frame_hash) <= self.max_distance:
+                    return result
+        return None
+
+    def store(self, client, frame_hash, result, now=None):
+        if self.window <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entries = self._clients.setdefault(client, [])
+            self._clients.move_to_end(client)
+            entries[:] = [entry for entry in entries if now - entry[1] <= self.window]
+            entries.append((frame_hash, now, result))
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
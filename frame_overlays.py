@@ -0,0 +1,18 @@
+import cv2
+
+
+def draw_overlays(frame, overlays=(), status=(), footer=()):
+    """Draw face boxes and status text onto a frame for a cv2 window
+
+    overlays are (box, text, bgr_color) with text None for a bare box;
+    status lines go top left, footer lines bottom left.
+    """
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    for (x, y, w, h), text, color in overlays:
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        if text:
+            cv2.putText(frame, text, (x, y - 10), font, 0.8, color, 2)
+    for i, line in enumerate(status):
+        cv2.putText(frame, line, (10, 30 + 30 * i), font, 0.7, (255, 255, 255), 2)
+    for i, line in enumerate(footer):
+        cv2.putText(frame, line, (10, frame.shape[0] - 15 - 22 * i), font, 0.55, (0, 255, 255), 1)
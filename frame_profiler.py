@@ -0,0 +1,118 @@
+import contextlib
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+
+# Number of recent frames used for the live FPS and stage overlay
+OVERLAY_WINDOW = 30
+
+
+class FrameProfiler:
+    """Per-frame stage timings for the live attendance loop
+
+    When disabled every call is a no-op, so the loop can be instrumented
+    unconditionally.
+    """
+
+    def __init__(self, enabled=True, metadata=None):
+        self.enabled = enabled
+        self.metadata = dict(metadata or {})
+        self.frames = []
+        self.stage_names = []
+        self._current = None
+        self._frame_start = None
+        self._started_at = datetime.datetime.now()
+
+    def start_frame(self):
+        """Begin timing a new frame"""
+        if self.enabled:
+            self._current = {}
+            self._frame_start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time one stage of the current frame (repeated stages accumulate)"""
+        if not self.enabled or self._current is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if name not in self.stage_names:
+                self.stage_names.append(name)
+            self._current[name] = self._current.get(name, 0.0) + time.perf_counter() - start
+
+    def end_frame(self, **counts):
+        """Finish the current frame, optionally recording counts such as faces found"""
+        if not self.enabled or self._current is None:
+            return
+        end = time.perf_counter()
+        self._current['total'] = end - self._frame_start
+        self._current['end'] = end
+        self._current.update(counts)
+        self.frames.append(self._current)
+        self._current = None
+
+    def fps(self):
+        """Frames per second over the recent window"""
+        recent = self.frames[-OVERLAY_WINDOW:]
+        if len(recent) < 2:
+            return 0.0
+        elapsed = recent[-1]['end'] - recent[0]['end']
+        return (len(recent) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def overlay_lines(self):
+        """Text lines for the live overlay: FPS and recent mean latency per stage"""
+        if not self.enabled or not self.frames:
+            return []
+        recent = self.frames[-OVERLAY_WINDOW:]
+        lines = [f"FPS: {self.fps():.1f}  frame: {np.mean([f['total'] for f in recent]) * 1000:.0f}ms"]
+        parts = [f"{name} {np.mean([f.get(name, 0.0) for f in recent]) * 1000:.1f}ms" for name in self.stage_names]
+        # Two stages per line keeps the overlay readable on small frames
+        for i in range(0, len(parts), 2):
+            lines.append("  ".join(parts[i:i + 2]))
+        return lines
+
+    def summary(self):
+        """Per-stage latency percentiles in milliseconds over the whole session"""
+        result = {}
+        for name in self.stage_names + ['total']:
+            values = np.array([f.get(name, 0.0) for f in self.frames]) * 1000
+            if len(values) == 0:
+                continue
+            result[name] = {
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(np.percentile(values, 50)),
+                'p90_ms': float(np.percentile(values, 90)),
+                'p95_ms': float(np.percentile(values, 95)),
+                'p99_ms': float(np.percentile(values, 99)),
+                'max_ms': float(values.max()),
+            }
+        return result
+
+    def write_report(self, directory):
+        """Write the session profile as JSON, returns the file path"""
+        if not self.enabled:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile_{self._started_at.strftime('%Y%m%d_%H%M%S')}.json")
+        duration = self.frames[-1]['end'] - self.frames[0]['end'] if len(self.frames) > 1 else 0.0
+        report = {
+            'started_at': self._started_at.isoformat(timespec='seconds'),
+            'frames': len(self.frames),
+            'mean_fps': (len(self.frames) - 1) / duration if duration > 0 else 0.0,
+            'metadata': self.metadata,
+            'stages': self.summary(),
+            'per_frame_ms': [
+                {name: round(value * 1000, 3) if name in self.stage_names or name == 'total' else value
+                 for name, value in frame.items() if name != 'end'}
+                for frame in self.frames
+            ],
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+        return path
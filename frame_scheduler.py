@@ -0,0 +1,181 @@
+import collections
+import os
+import time
+
+# End-to-end latency a displayed frame should stay within (ATTENDANCE_LATENCY_BUDGET_MS, 0 disables)
+DEFAULT_BUDGET = float(os.environ.get("ATTENDANCE_LATENCY_BUDGET_MS", "100")) / 1000.0
+
+# Faces barely move between frames; detecting more often than this wastes CPU
+DEFAULT_MAX_DETECT_RATE = float(os.environ.get("ATTENDANCE_MAX_DETECT_FPS", "10"))
+
+# Seconds a tracked face keeps its recognition result before it is predicted again
+DEFAULT_RELABEL_AFTER = float(os.environ.get("ATTENDANCE_RELABEL_AFTER", "1.0"))
+
+# Upper bounds on adaptation: frames between detections, frames dropped before one read
+MAX_DETECT_INTERVAL = 15
+MAX_DROP = 5
+
+# Weight of the newest measurement in the moving averages
+SMOOTHING = 0.2
+
+# Boxes overlapping at least this much are taken to be the same face
+MATCH_IOU = 0.5
+
+# ...and only when their face crop hashes differ in at most this many bits
+MATCH_DISTANCE = 8
+
+FramePlan = collections.namedtuple("FramePlan", "drop detect")
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class FrameScheduler:
+    """Decides how much work each live frame gets so the loop stays within a latency budget
+
+    Detection and recognition costs and the rest of the frame (read, draw,
+    display) are tracked as moving averages. Detection runs every N frames,
+    with N the smallest interval whose average frame cost fits the budget
+    (and no more often than max_detect_rate). Faces that overlap a recently
+    recognized face and whose crop looks the same reuse its result instead
+    of being predicted again, so someone stepping into the previous
+    person's place is always predicted. When
+    a frame still takes longer than the camera's frame period, the frames
+    that piled up meanwhile are dropped before the next read, so the display
+    falls behind by at most a frame instead of accumulating lag.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET, source_fps=0.0, live=True,
+                 max_detect_rate=DEFAULT_MAX_DETECT_RATE, relabel_after=DEFAULT_RELABEL_AFTER):
+        self.budget = budget
+        self.enabled = budget > 0
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 0.0
+        self.live = live
+        self.max_detect_rate = max_detect_rate
+        self.relabel_after = relabel_after
+        self.costs = {'detect': 0.0, 'predict': 0.0, 'other': 0.0}
+        self.detect_interval = 1
+        self.frames = 0
+        self.detections = 0
+        self.predictions = 0
+        self.reused = 0
+        self.dropped = 0
+        self._since_detect = None
+        self._frame_start = None
+        self._frame_costs = {}
+        self._last_total = 0.0
+        self._measured = set()
+        self._tracked = []  # (box, signature, prediction, predicted_at)
+        self._reused_at = {}
+
+    def _smooth(self, name, value):
+        if name in self._measured:
+            self.costs[name] += SMOOTHING * (value - self.costs[name])
+        else:
+            self._measured.add(name)
+            self.costs[name] = value
+
+    def plan(self):
+        """Start a frame: how many buffered frames to drop and whether to detect on this one"""
+        self._frame_start = time.perf_counter()
+        self._frame_costs = {}
+        if not self.enabled:
+            return FramePlan(0, True)
+
+        drop = 0
+        if self.live and self.source_fps and self._last_total * self.source_fps > 1.5:
+            drop = min(MAX_DROP, int(self._last_total * self.source_fps) - 1)
+            self.dropped += drop
+
+        detect = self._since_detect is None or self._since_detect + 1 + drop >= self.detect_interval
+        return FramePlan(drop, detect)
+
+    def record(self, stage, seconds):
+        """Time spent in 'detect' or 'predict' on the current frame"""
+        self._frame_costs[stage] = self._frame_costs.get(stage, 0.0) + seconds
+
+    def end_frame(self, detected):
+        """Finish the current frame and adapt the detection interval"""
+        total = time.perf_counter() - self._frame_start
+        self.frames += 1
+        self._last_total = total
+        if detected:
+            self.detections += 1
+            self._since_detect = 0
+            work = self._frame_costs.get('detect', 0.0) + self._frame_costs.get('predict', 0.0)
+            self._smooth('detect', self._frame_costs.get('detect', 0.0))
+            self._smooth('predict', self._frame_costs.get('predict', 0.0))
+            self._smooth('other', total - work)
+        else:
+            self._since_detect = (self._since_detect or 0) + 1
+            self._smooth('other', total)
+        if self.enabled:
+            self.detect_interval = self._interval()
+
+    def _interval(self):
+        """Frames between detections that keeps the average frame within the budget"""
+        work = self.costs['detect'] + self.costs['predict']
+        headroom = self.budget - self.costs['other']
+        interval = MAX_DETECT_INTERVAL if headroom <= 0 else int(-(-work // headroom))
+        if self.source_fps and self.max_detect_rate > 0:
+            interval = max(interval, int(round(self.source_fps / self.max_detect_rate)))
+        return max(1, min(MAX_DETECT_INTERVAL, interval))
+
+    def match(self, boxes, signatures=None, now=None):
+        """Reusable predictions for detected boxes, and the indices that still need predicting
+
+        signatures are hashes of the boxes' face crops (frame_dedup.dhash);
+        a tracked result is only reused for a box that overlaps it and whose
+        crop hash is within MATCH_DISTANCE bits. Without signatures every box
+        is predicted. Returns (predictions, pending): predictions[i] is a
+        recent result of the same face as boxes[i], or None when boxes[i] is
+        in pending and must be predicted.
+        """
+        now = time.monotonic() if now is None else now
+        predictions = [None] * len(boxes)
+        pending = []
+        self._reused_at = {}
+        for i, box in enumerate(boxes):
+            if self.enabled and signatures is not None:
+                for tracked_box, signature, prediction, predicted_at in self._tracked:
+                    if now - predicted_at <= self.relabel_after and iou(box, tracked_box) >= MATCH_IOU \
+                            and bin(signature ^ signatures[i]).count("1") <= MATCH_DISTANCE:
+                        predictions[i] = prediction
+                        self._reused_at[i] = predicted_at
+                        break
+            if predictions[i] is None:
+                pending.append(i)
+        self.reused += len(boxes) - len(pending)
+        self.predictions += len(pending)
+        return predictions, pending
+
+    def remember(self, boxes, predictions, signatures=None, now=None):
+        """Track this frame's faces with their predictions (failed predictions are None)"""
+        now = time.monotonic() if now is None else now
+        if signatures is None:
+            self._tracked = []
+            return
+        # Reused results keep their original time, so they are refreshed eventually
+        self._tracked = [(tuple(int(v) for v in box), signature, prediction, self._reused_at.get(i, now))
+                         for i, (box, signature, prediction) in enumerate(zip(boxes, signatures, predictions))
+                         if prediction is not None]
+
+    def overlay_line(self):
+        return (f"detect every {self.detect_interval}  dropped {self.dropped}  "
+                f"reused {self.reused}/{self.reused + self.predictions}")
+
+    def stats(self):
+        return {'budget_ms': self.budget * 1000, 'frames': self.frames, 'detections': self.detections,
+                'detect_interval': self.detect_interval, 'predictions': self.predictions,
+                'reused_predictions': self.reused, 'dropped_frames': self.dropped,
+                'detect_ms': self.costs['detect'] * 1000, 'predict_ms': self.costs['predict'] * 1000,
+                'other_ms': self.costs['other'] * 1000}
@@ -0,0 +1,263 @@
+import os
+import time
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+STREAM_PREFIXES = ('rtsp://', 'rtsps://', 'rtmp://', 'http://', 'https://', 'udp://', 'tcp://')
+
+# Frame rate assumed for image directories and files that do not report one
+DEFAULT_FPS = 15.0
+
+
+class FrameSource:
+    """Common interface for cameras, video files, image directories and network streams
+
+    read() mirrors cv2.VideoCapture.read() so sources are drop-in replacements;
+    read_timestamped() also returns the frame timestamp in seconds since the
+    source was opened (media time for files and image directories).
+
+    In replay mode recorded sources are delivered as fast as they are read,
+    with timestamps taken from the recording, so runs are deterministic.
+    Otherwise recorded sources are paced to their frame rate like a camera.
+    """
+
+    live = False
+
+    def __init__(self, description, replay=False, loop=False):
+        self.description = description
+        self.replay = replay
+        self.loop = loop
+        self.last_timestamp = None
+        self.frames_read = 0
+        self._opened_at = None
+
+    def open(self):
+        """Open the underlying source, returns True on success"""
+        raise NotImplementedError
+
+    def isOpened(self):
+        raise NotImplementedError
+
+    def _read(self):
+        """Read the next frame, returns (ok, frame, timestamp)"""
+        raise NotImplementedError
+
+    def read_timestamped(self):
+        ok, frame, timestamp = self._read()
+        if ok:
+            self.frames_read += 1
+            self.last_timestamp = timestamp
+        return ok, frame, timestamp
+
+    def read(self):
+        ok, frame, _ = self.read_timestamped()
+        return ok, frame
+
+    def grab(self):
+        """Skip one frame without decoding it where the source allows that"""
+        ok, _, _ = self.read_timestamped()
+        return ok
+
+    def get(self, prop):
+        """cv2.CAP_PROP_* lookup, 0 when the source does not know the value"""
+        return 0.0
+
+    def release(self):
+        pass
+
+    def _pace(self, timestamp):
+        """Sleep until a recorded frame is due when not in replay mode"""
+        if self.replay:
+            return
+        if self._opened_at is None:
+            self._opened_at = time.monotonic() - timestamp
+        delay = self._opened_at + timestamp - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.description}>"
+
+
+class CaptureSource(FrameSource):
+    """cv2.VideoCapture backed source: device index, video file or stream URL"""
+
+    def __init__(self, target, kind, replay=False, loop=False, reconnect_attempts=3, reconnect_delay=1.0):
+        super().__init__(f"{kind}:{target}", replay, loop)
+        self.target = target
+        self.kind = kind
+        self.live = kind in ('device', 'stream')
+        self.reconnect_attempts = reconnect_attempts if self.live else 0
+        self.reconnect_delay = reconnect_delay
+        self.reconnects = 0
+        self._cap = None
+        self._start = None
+        self._fps = DEFAULT_FPS
+        self._loop_offset = 0.0
+
+    def open(self):
+        self.release()
+        self._cap = cv2.VideoCapture(self.target)
+        if not self._cap.isOpened():
+            return False
+        if self._start is None:
+            self._start = time.monotonic()
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self._fps = fps if fps and fps > 0 else DEFAULT_FPS
+        return True
+
+    def isOpened(self):
+        return self._cap is not None and self._cap.isOpened()
+
+    def _reconnect(self):
+        """Reopen a live source after a failed read"""
+        for attempt in range(1, self.reconnect_attempts + 1):
+            print(f"Frame source {self.description} lost, reconnecting ({attempt}/{self.reconnect_attempts})...")
+            time.sleep(self.reconnect_delay * attempt)
+            if self.open():
+                self.reconnects += 1
+                return True
+        return False
+
+    def _timestamp(self):
+        if self.live:
+            return time.monotonic() - self._start
+        position = self._cap.get(cv2.CAP_PROP_POS_MSEC)
+        if position and position > 0:
+            return self._loop_offset + position / 1000.0
+        return self.frames_read / self._fps
+
+    def _read(self):
+        if self._cap is None or self._start is None:
+            return False, None, None
+        ok, frame = self._cap.read()
+        if not ok and self.live and self._reconnect():
+            ok, frame = self._cap.read()
+        if not ok and self.loop and not self.live:
+            # Keep timestamps increasing across loops
+            self._loop_offset = (self.last_timestamp or 0.0) + 1.0 / self._fps
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._cap.read()
+        if not ok:
+            return False, None, None
+        timestamp = self._timestamp()
+        if not self.live:
+            self._pace(timestamp)
+        return True, frame, timestamp
+
+    def grab(self):
+        if self._cap is None:
+            return False
+        ok = self._cap.grab()
+        if ok:
+            self.frames_read += 1
+        return ok
+
+    def get(self, prop):
+        return self._cap.get(prop) if self._cap is not None else 0.0
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class ImageDirectorySource(FrameSource):
+    """Frames read from the image files of a directory in sorted order"""
+
+    def __init__(self, directory, replay=False, loop=False, fps=DEFAULT_FPS):
+        super().__init__(f"images:{directory}", replay, loop)
+        self.directory = directory
+        self.fps = fps
+        self.files = []
+        self._index = 0
+        self._size = (0.0, 0.0)
+
+    def open(self):
+        if not os.path.isdir(self.directory):
+            return False
+        self.files = sorted(os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                            if f.lower().endswith(IMAGE_EXTENSIONS))
+        self._index = 0
+        if not self.files:
+            return False
+        first = cv2.imread(self.files[0])
+        if first is not None:
+            self._size = (float(first.shape[1]), float(first.shape[0]))
+        return True
+
+    def isOpened(self):
+        return len(self.files) > 0
+
+    def _read(self):
+        if self._index >= len(self.files):
+            if not self.loop or not self.files:
+                return False, None, None
+            self._index = 0
+        position = self.frames_read
+        frame = cv2.imread(self.files[self._index])
+        self._index += 1
+        if frame is None:
+            return False, None, None
+        self._size = (float(frame.shape[1]), float(frame.shape[0]))
+        timestamp = position / self.fps
+        self._pace(timestamp)
+        return True, frame, timestamp
+
+    def grab(self):
+        if self._index >= len(self.files):
+            if not self.loop or not self.files:
+                return False
+            self._index = 0
+        self._index += 1
+        self.frames_read += 1
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self._size[0]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self._size[1]
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.files))
+        return 0.0
+
+
+def default_source_spec():
+    """Frame source configured for this machine (ATTENDANCE_CAMERA), defaults to webcam 0"""
+    return os.environ.get("ATTENDANCE_CAMERA", "0")
+
+
+def create_frame_source(spec=None, replay=False, loop=False, **options):
+    """Build an unopened frame source from a device index, video file, image directory or stream URL"""
+    if spec is None:
+        spec = default_source_spec()
+    fps = options.pop('fps', DEFAULT_FPS)
+    if isinstance(spec, FrameSource):
+        return spec
+    if isinstance(spec, int) or str(spec).strip().isdigit():
+        return CaptureSource(int(spec), 'device', replay, loop, **options)
+
+    spec = str(spec).strip()
+    if spec.lower().startswith(STREAM_PREFIXES):
+        return CaptureSource(spec, 'stream', replay, loop, **options)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, replay, loop, fps=fps)
+    return CaptureSource(spec, 'file', replay, loop, **options)
+
+
+def open_frame_source(spec=None, replay=False, loop=False, **options):
+    """Create and open a frame source; check isOpened() on the result like cv2.VideoCapture"""
+    source = create_frame_source(spec, replay, loop, **options)
+    if not source.isOpened():
+        source.open()
+    return source
@@ -0,0 +1,215 @@
+import os
+import threading
+import tkinter as tk
+
+from fast_start import lazy_import
+
+# Imported on first frame, so the preview widget costs nothing at startup
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+
+# Preview redraws per second at most (ATTENDANCE_PREVIEW_FPS), independent of the processing rate
+DEFAULT_REFRESH_RATE = float(os.environ.get("ATTENDANCE_PREVIEW_FPS", "60"))
+
+# Largest preview size; bigger camera frames are scaled down before they reach Tk
+MAX_WIDTH = 640
+MAX_HEIGHT = 480
+
+
+def _hex_color(bgr):
+    b, g, r = bgr
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+class FrameMailbox:
+    """Hands the newest frame from a processing thread to the display thread
+
+    Three RGB buffers, allocated once per frame size, rotate between the
+    writer, the newest frame and the one being displayed, so neither side
+    waits for the other and nothing is allocated per frame. A frame that is
+    replaced before it was displayed is simply skipped.
+    """
+
+    def __init__(self, max_width=MAX_WIDTH, max_height=MAX_HEIGHT):
+        self.max_width = max_width
+        self.max_height = max_height
+        self.frames = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._buffers = []
+        self._scaled = None
+        self._scale = 1.0
+        self._latest = None
+        self._reading = None
+        self._sequence = 0
+        self._read_sequence = 0
+        self._overlays = ()
+        self._status = ()
+
+    def _prepare(self, shape):
+        """(Re)allocate the buffers for a new frame size, called by the writer"""
+        height, width = shape[:2]
+        scale = min(1.0, self.max_width / width, self.max_height / height)
+        size = (max(1, int(height * scale)), max(1, int(width * scale)), 3)
+        if self._buffers and self._buffers[0].shape == size and self._scale == scale:
+            return
+        with self._lock:
+            self._scale = scale
+            self._buffers = [np.empty(size, np.uint8) for _ in range(3)]
+            self._scaled = np.empty(size, np.uint8) if scale < 1.0 else None
+            self._latest = None
+
+    def put(self, frame, overlays=(), status=()):
+        """Publish a BGR frame with its overlays (writer thread, never blocks on the display)"""
+        self._prepare(frame.shape)
+        with self._lock:
+            index = next(i for i in range(3) if i != self._latest and i != self._reading)
+            target = self._buffers[index]
+            scale = self._scale
+        if self._scaled is not None:
+            cv2.resize(frame, (target.shape[1], target.shape[0]), self._scaled, interpolation=cv2.INTER_AREA)
+            frame = self._scaled
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, target)
+        if scale != 1.0:
+            overlays = [(tuple(int(v * scale) for v in box), text, color) for box, text, color in overlays]
+        else:
+            overlays = [(tuple(int(v) for v in box), text, color) for box, text, color in overlays]
+        with self._lock:
+            if self._sequence != self._read_sequence:
+                self.skipped += 1
+            self._latest = index
+            self._sequence += 1
+            self._overlays = overlays
+            self._status = tuple(status)
+            self.frames += 1
+
+    def take(self):
+        """The newest frame not yet taken as (rgb, overlays, status), or None; release() when done"""
+        with self._lock:
+            if self._latest is None or self._sequence == self._read_sequence:
+                return None
+            self._reading = self._latest
+            self._read_sequence = self._sequence
+            return self._buffers[self._reading], self._overlays, self._status
+
+    def release(self):
+        with self._lock:
+            self._reading = None
+
+
+class LivePreview(tk.Frame):
+    """Camera preview inside the application window, fed by a capture or attendance session
+
+    The session thread calls show() for every processed frame; the Tk side
+    redraws at most refresh_rate times a second, pasting only the newest
+    frame into a single reused PhotoImage. Face boxes and labels are canvas
+    items that are only recreated when the detections change, and status
+    lines are only reconfigured when their text does. The Stop button sets a
+    flag the session polls with stop_requested().
+    """
+
+    def __init__(self, master, max_width=MAX_WIDTH, max_height=MAX_HEIGHT,
+                 refresh_rate=DEFAULT_REFRESH_RATE, **kwargs):
+        super().__init__(master, bg="#f0f0f0", **kwargs)
+        self.interval = max(1, int(round(1000 / refresh_rate)))
+        self.mailbox = FrameMailbox(max_width, max_height)
+        self._stop = threading.Event()
+        self._tick_id = None
+        self._photo = None
+        self._drawn_overlays = None
+        self._status_items = []
+        self.rendered = 0
+        self.overlay_redraws = 0
+
+        self.title = tk.Label(self, text="", bg="#f0f0f0", fg="#333333", font=('Helvetica', 12, 'bold'))
+        self.title.pack(pady=(0, 5))
+        self.canvas = tk.Canvas(self, width=max_width, height=max_height, bg="black", highlightthickness=0)
+        self.canvas.pack()
+        self._image_item = self.canvas.create_image(0, 0, anchor="nw")
+        self.stop_button = tk.Button(self, text="Stop", command=self.request_stop,
+                                     fg="white", bg="#dc3545", width=10, font=('Helvetica', 10, 'bold'))
+        self.stop_button.pack(pady=5)
+
+    # Session thread side
+    def show(self, frame, overlays=(), status=()):
+        """Queue a BGR frame for display with (box, text, bgr_color) overlays and status lines"""
+        self.mailbox.put(frame, overlays, status)
+
+    def stop_requested(self):
+        return self._stop.is_set()
+
+    def stats(self):
+        return {'frames': self.mailbox.frames, 'rendered': self.rendered,
+                'skipped': self.mailbox.skipped, 'overlay_redraws': self.overlay_redraws}
+
+    # Tk side
+    def start(self, title):
+        """Begin showing a session's frames"""
+        self.title.config(text=title)
+        self.stop_button.config(state='normal')
+        self._stop.clear()
+        self.mailbox = FrameMailbox(self.mailbox.max_width, self.mailbox.max_height)
+        self.rendered = 0
+        self.overlay_redraws = 0
+        if self._tick_id is None:
+            self._tick_id = self.after(self.interval, self._tick)
+
+    def finish(self):
+        """Stop redrawing once the session has ended"""
+        if self._tick_id is not None:
+            self.after_cancel(self._tick_id)
+            self._tick_id = None
+        self.canvas.delete("overlay")
+        self._drawn_overlays = None
+
+    def request_stop(self):
+        self._stop.set()
+        self.stop_button.config(state='disabled')
+
+    def _tick(self):
+        self._tick_id = self.after(self.interval, self._tick)
+        taken = self.mailbox.take()
+        if taken is None:
+            return
+        rgb, overlays, status = taken
+        try:
+            self._paste(rgb)
+        finally:
+            self.mailbox.release()
+        if overlays != self._drawn_overlays:
+            self._draw_overlays(overlays)
+        self._draw_status(status)
+        self.rendered += 1
+
+    def _paste(self, rgb):
+        height, width = rgb.shape[:2]
+        image = Image.frombuffer("RGB", (width, height), rgb, "raw", "RGB", 0, 1)
+        if self._photo is None or (self._photo.width(), self._photo.height()) != (width, height):
+            self._photo = ImageTk.PhotoImage(image, master=self)
+            self.canvas.itemconfigure(self._image_item, image=self._photo)
+            self.canvas.config(width=width, height=height)
+        else:
+            self._photo.paste(image)
+
+    def _draw_overlays(self, overlays):
+        self.canvas.delete("overlay")
+        for (x, y, w, h), text, color in overlays:
+            color = _hex_color(color)
+            self.canvas.create_rectangle(x, y, x + w, y + h, outline=color, width=2, tags="overlay")
+            if text:
+                self.canvas.create_text(x, y - 4, text=text, anchor="sw", fill=color,
+                                        font=('Helvetica', 11, 'bold'), tags="overlay")
+        self._drawn_overlays = overlays
+        self.overlay_redraws += 1
+
+    def _draw_status(self, status):
+        while len(self._status_items) < len(status):
+            self._status_items.append(self.canvas.create_text(
+                10, 10 + 22 * len(self._status_items), anchor="nw", fill="white",
+                font=('Helvetica', 11, 'bold'), text=""))
+        for i, item in enumerate(self._status_items):
+            text = status[i] if i < len(status) else ""
+            if self.canvas.itemcget(item, "text") != text:
+                self.canvas.itemconfigure(item, text=text)
@@ -0,0 +1,155 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from face_matcher import LBPHMatcher
+import model_store
+
+
+def k_medoids(distances, k, max_iter=100, seed=0):
+    """Pick k medoid indices from a square distance matrix (alternating k-medoids)"""
+    count = len(distances)
+    if k >= count:
+        return np.arange(count)
+
+    # k-medoids++ style seeding: start from the most central sample, then favour far-away ones
+    rng = np.random.default_rng(seed)
+    medoids = [int(distances.sum(axis=1).argmin())]
+    while len(medoids) < k:
+        nearest = distances[:, medoids].min(axis=1)
+        if nearest.sum() <= 0:
+            remaining = np.setdiff1d(np.arange(count), medoids)
+            medoids.append(int(rng.choice(remaining)))
+        else:
+            medoids.append(int(rng.choice(count, p=nearest / nearest.sum())))
+    medoids = np.array(medoids)
+
+    for _ in range(max_iter):
+        assignment = distances[:, medoids].argmin(axis=1)
+        updated = medoids.copy()
+        for cluster in range(k):
+            members = np.flatnonzero(assignment == cluster)
+            if len(members) == 0:
+                continue
+            within = distances[np.ix_(members, members)].sum(axis=1)
+            updated[cluster] = members[within.argmin()]
+        if np.array_equal(np.sort(updated), np.sort(medoids)):
+            break
+        medoids = updated
+
+    return np.sort(medoids)
+
+
+def compress_histograms(histograms, labels, prototypes_per_label, seed=0):
+    """Reduce each label's histograms to at most prototypes_per_label medoids"""
+    histograms = np.asarray(histograms, np.float32)
+    labels = np.asarray(labels, np.int32).reshape(-1)
+    keep = []
+
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        if len(members) <= prototypes_per_label:
+            keep.extend(members)
+            continue
+        # Chi-square distances between this label's own samples
+        matcher = LBPHMatcher()
+        matcher.set_histograms(histograms[members], labels[members])
+        distances = matcher.distances(histograms[members])
+        keep.extend(members[k_medoids(distances, prototypes_per_label, seed=seed)])
+
+    keep = np.sort(np.array(keep, dtype=np.int64))
+    return histograms[keep], labels[keep]
+
+
+def holdout_split(labels, holdout=0.2, seed=0):
+    """Stratified split of sample indices into (train, test), holding out a fraction per label"""
+    rng = np.random.default_rng(seed)
+    train, test = [], []
+    for label in np.unique(labels):
+        members = rng.permutation(np.flatnonzero(labels == label))
+        held = int(round(len(members) * holdout))
+        if len(members) > 1:
+            held = min(max(held, 1), len(members) - 1)
+        else:
+            held = 0
+        test.extend(members[:held])
+        train.extend(members[held:])
+    return np.sort(np.array(train, dtype=np.int64)), np.sort(np.array(test, dtype=np.int64))
+
+
+def _accuracy(matcher, queries, expected):
+    """Nearest-neighbour accuracy and mean per-query predict time of a matcher"""
+    if len(expected) == 0:
+        return 0.0, 0.0
+    start = time.perf_counter()
+    distances = matcher.distances(queries)
+    elapsed = time.perf_counter() - start
+    predicted = matcher.labels[distances.argmin(axis=1)]
+    return float((predicted == expected).mean()), elapsed / len(expected)
+
+
+def evaluate_compression(histograms, labels, prototypes_per_label, holdout=0.2, seed=0):
+    """Compare full and prototype models on a held-out split"""
+    histograms = np.asarray(histograms, np.float32)
+    labels = np.asarray(labels, np.int32).reshape(-1)
+    train, test = holdout_split(labels, holdout, seed)
+
+    full = LBPHMatcher()
+    full.set_histograms(histograms[train], labels[train])
+    compressed = LBPHMatcher()
+    compressed.set_histograms(*compress_histograms(histograms[train], labels[train], prototypes_per_label, seed))
+
+    full_accuracy, full_time = _accuracy(full, histograms[test], labels[test])
+    compressed_accuracy, compressed_time = _accuracy(compressed, histograms[test], labels[test])
+
+    return {
+        'test_samples': int(len(test)),
+        'full_samples': int(len(full.labels)),
+        'compressed_samples': int(len(compressed.labels)),
+        'full_accuracy': full_accuracy,
+        'compressed_accuracy': compressed_accuracy,
+        'accuracy_delta': compressed_accuracy - full_accuracy,
+        'full_predict_ms': full_time * 1000,
+        'compressed_predict_ms': compressed_time * 1000,
+    }
+
+
+def format_report(report):
+    """Human readable summary of evaluate_compression() output"""
+    speedup = report['full_predict_ms'] / report['compressed_predict_ms'] if report['compressed_predict_ms'] else 0.0
+    return (f"Samples: {report['full_samples']} -> {report['compressed_samples']} | "
+            f"Accuracy: {report['full_accuracy']:.1%} -> {report['compressed_accuracy']:.1%} "
+            f"({report['accuracy_delta']:+.1%} on {report['test_samples']} held-out) | "
+            f"Predict: {report['full_predict_ms']:.2f} ms -> {report['compressed_predict_ms']:.2f} ms ({speedup:.1f}x)")
+
+
+def compress_model(model_path, output_path=None, prototypes_per_label=5, holdout=0.2, seed=0):
+    """Evaluate and write a prototype-compressed copy of a trained model (YAML and binary), returns the report"""
+    matcher = LBPHMatcher()
+    matcher.read(model_path, mmap=False)  # the output may replace the file being read
+    if matcher.empty():
+        raise ValueError("Model has no training samples")
+
+    report = evaluate_compression(matcher.histograms, matcher.labels, prototypes_per_label, holdout, seed)
+
+    histograms, labels = compress_histograms(matcher.histograms, matcher.labels, prototypes_per_label, seed)
+    matcher.set_histograms(histograms, labels)
+    output_path = output_path or model_path
+    matcher.save(output_path)
+    matcher.save(model_store.binary_path_for(output_path))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress a trained LBPH model to per-student prototypes")
+    parser.add_argument("--model", default=os.path.join("TrainingImageLabel", "Trainer.yml"))
+    parser.add_argument("--output", default=None, help="Output path (default: overwrite --model)")
+    parser.add_argument("--prototypes", type=int, default=5, help="Prototypes kept per student")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction held out for the accuracy check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = compress_model(args.model, args.output, args.prototypes, args.holdout, args.seed)
+    print(format_report(result))
@@ -0,0 +1,185 @@
+import argparse
+import csv
+import json
+import os
+import re
+
+import numpy as np
+
+from face_matcher import LBPHMatcher
+import model_store
+
+# Section registry and per-section models live under the label directory
+REGISTRY_NAME = "Sections.json"
+SHARD_DIR = "sections"
+
+_SECTION_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def check_section_name(name):
+    """Raise ValueError unless name is safe to use as a file name (letters, digits, '-' and '_')"""
+    if not isinstance(name, str) or not _SECTION_NAME.match(name):
+        raise ValueError(f"Invalid section name: {name!r} (letters, digits, '-' and '_' only)")
+
+
+class SectionRegistry:
+    """Maps each section (course, lab group, session) to the student IDs on its roster"""
+
+    def __init__(self, label_path):
+        self.label_path = label_path
+        self.path = os.path.join(label_path, REGISTRY_NAME)
+        self.sections = {}
+        self.load()
+
+    def load(self):
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.sections = {name: [str(i).lower() for i in ids] for name, ids in data.get('sections', {}).items()}
+        return self
+
+    def save(self):
+        """Write the registry atomically"""
+        os.makedirs(self.label_path, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'sections': self.sections}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def set_section(self, name, student_ids):
+        check_section_name(name)
+        self.sections[name] = sorted({str(i).strip().lower() for i in student_ids if str(i).strip()})
+
+    def remove_section(self, name):
+        self.sections.pop(name, None)
+        path = self.shard_path(name)
+        if os.path.isfile(path):
+            os.remove(path)
+
+    def roster(self, name):
+        """Student IDs of a section, None for an unknown section"""
+        return self.sections.get(name)
+
+    def names(self):
+        return sorted(self.sections)
+
+    def shard_path(self, name):
+        return shard_path(self.label_path, name)
+
+
+def shard_path(label_path, name):
+    """Where the model of a section is stored
+
+    Section names come from clients (Flask requests), so anything that could
+    leave the sections directory is rejected here, for every caller.
+    """
+    check_section_name(name)
+    return os.path.join(label_path, SHARD_DIR, name + model_store.BINARY_EXTENSION)
+
+
+def load_serials(student_file):
+    """Student ID -> serial number (model label) from StudentDetails.csv"""
+    serials = {}
+    if not os.path.isfile(student_file):
+        return serials
+    with open(student_file, newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                serials.setdefault(str(row['ID']).strip().lower(), int(row['SERIAL NO.']))
+            except (KeyError, ValueError):
+                continue
+    return serials
+
+
+def build_shard(model, serials):
+    """Matcher holding only the samples of the given labels, sliced from a trained model"""
+    mask = np.isin(model.labels, np.asarray(list(serials), dtype=np.int32))
+    shard = LBPHMatcher(**model.params)
+    shard.set_bins(np.ascontiguousarray(model.bins[:, mask]), np.ascontiguousarray(model.labels[mask]))
+    return shard
+
+
+def write_shards(registry, model, serials):
+    """Write one binary model per section from an already trained model
+
+    Histograms are sliced rather than recomputed, so this costs a copy of
+    the model regardless of how many sections there are. Returns the number
+    of samples in each written shard.
+    """
+    os.makedirs(os.path.join(registry.label_path, SHARD_DIR), exist_ok=True)
+    written = {}
+    for name in registry.names():
+        labels = [serials[student_id] for student_id in registry.roster(name) if student_id in serials]
+        missing = len(registry.roster(name)) - len(labels)
+        if missing:
+            print(f"Section {name}: {missing} students on the roster are not registered")
+        path = registry.shard_path(name)
+        shard = build_shard(model, labels)
+        if shard.empty():
+            # An empty model cannot predict; the section falls back to the full model
+            print(f"Section {name}: no trained samples, not writing a model")
+            if os.path.isfile(path):
+                os.remove(path)
+            continue
+        shard.save(path)
+        written[name] = len(shard.labels)
+    return written
+
+
+# (shard path, shard mtime) already reported as stale, so a reload on every request warns once
+_stale_warned = set()
+
+
+def resolve_shard_path(label_path, section):
+    """Model file for a section, None when the section has no shard or it predates the full model"""
+    if not section:
+        return None
+    path = shard_path(label_path, section)
+    if not os.path.isfile(path):
+        return None
+    # A shard older than the full model misses students trained since; rebuild it first
+    model_path = model_store.resolve_model_path(label_path)
+    shard_mtime = os.path.getmtime(path)
+    if model_path is not None and shard_mtime < os.path.getmtime(model_path):
+        if (path, shard_mtime) not in _stale_warned:
+            _stale_warned.add((path, shard_mtime))
+            print(f"Model for section {section} is older than the full model, run 'model_shards.py build'")
+        return None
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage section rosters and their model shards")
+    parser.add_argument("--labels", default="TrainingImageLabel", help="Label directory holding the models")
+    parser.add_argument("--students", default=os.path.join("StudentDetails", "StudentDetails.csv"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("set", help="Create or replace a section roster")
+    add.add_argument("section")
+    add.add_argument("student_ids", nargs="+")
+    remove = commands.add_parser("remove", help="Delete a section and its shard")
+    remove.add_argument("section")
+    commands.add_parser("list", help="Show sections and roster sizes")
+    commands.add_parser("build", help="Write section shards from the trained model")
+    args = parser.parse_args()
+
+    registry = SectionRegistry(args.labels)
+    if args.command == "set":
+        registry.set_section(args.section, args.student_ids)
+        registry.save()
+        print(f"Section {args.section}: {len(registry.roster(args.section))} students. Run 'build' to update its model.")
+    elif args.command == "remove":
+        registry.remove_section(args.section)
+        registry.save()
+        print(f"Section {args.section} removed")
+    elif args.command == "list":
+        for name in registry.names():
+            shard = "built" if os.path.isfile(registry.shard_path(name)) else "not built"
+            print(f"{name}: {len(registry.roster(name))} students ({shard})")
+    else:
+        model_path = model_store.resolve_model_path(args.labels)
+        if model_path is None:
+            raise SystemExit("No trained model found. Please train first.")
+        model = LBPHMatcher()
+        model.read(model_path, mmap=False)
+        for name, samples in write_shards(registry, model, load_serials(args.students)).items():
+            print(f"Section {name}: {samples} samples")
@@ -0,0 +1,251 @@
+import argparse
+import os
+import struct
+
+import numpy as np
+
+# Binary LBPH model layout (little endian, every section 64-byte aligned):
+#   header   magic, version, radius, neighbors, grid_x, grid_y, threshold, samples, bins
+#   labels   int32[samples]
+#   sums     float64[samples]      per-sample histogram sums used by the matcher
+#   matrix   float32[bins, samples] histograms stored bins by samples
+BINARY_MAGIC = b"LBPHBIN\0"
+BINARY_VERSION = 1
+BINARY_EXTENSION = ".lbph"
+YAML_MODEL_NAME = "Trainer.yml"
+BINARY_MODEL_NAME = "Trainer" + BINARY_EXTENSION
+
+_HEADER = struct.Struct("<8sIiiiidQQ")
+_ALIGNMENT = 64
+
+
+def _aligned(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _layout(samples, bins):
+    """Byte offsets of the labels, sums and matrix sections"""
+    labels_offset = _aligned(_HEADER.size)
+    sums_offset = _aligned(labels_offset + 4 * samples)
+    matrix_offset = _aligned(sums_offset + 8 * samples)
+    return labels_offset, sums_offset, matrix_offset, matrix_offset + 4 * samples * bins
+
+
+def is_binary_model(path):
+    """Check if a file starts with the binary model magic"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    except OSError:
+        return False
+
+
+def write_binary_model(path, params, bins, labels, sums=None):
+    """Write a bins-by-samples float32 matrix and labels to a binary model file
+
+    The file is written next to the target and renamed into place, so readers
+    never see a partially written model.
+    """
+    bins = np.ascontiguousarray(bins, dtype=np.float32)
+    labels = np.ascontiguousarray(labels, dtype=np.int32).reshape(-1)
+    if sums is None:
+        sums = bins.sum(axis=0, dtype=np.float64)
+    sums = np.ascontiguousarray(sums, dtype=np.float64).reshape(-1)
+    feature_size, samples = bins.shape
+    labels_offset, sums_offset, matrix_offset, end = _layout(samples, feature_size)
+
+    header = _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, params['radius'], params['neighbors'],
+                          params['grid_x'], params['grid_y'], float(params['threshold']),
+                          samples, feature_size)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.seek(labels_offset)
+        f.write(labels.tobytes())
+        f.seek(sums_offset)
+        f.write(sums.tobytes())
+        f.seek(matrix_offset)
+        f.write(bins.tobytes())
+        # Pad to the full layout size; seeking alone leaves an empty model short
+        f.truncate(end)
+    os.replace(tmp_path, path)
+
+
+class BinaryModelWriter:
+    """Writes a binary model a chunk of samples at a time, for training with bounded memory
+
+    Space for `capacity` samples is laid out up front and each chunk's
+    histograms are written straight into their columns of the bins-by-samples
+    matrix, so only the current chunk is ever held in memory. If fewer
+    samples arrive the matrix is compacted row by row on close(). Like
+    write_binary_model the file only replaces `path` once it is complete.
+    """
+
+    def __init__(self, path, params, capacity, feature_size):
+        self.path = path
+        self.params = params
+        self.capacity = int(capacity)
+        self.feature_size = int(feature_size)
+        self.count = 0
+        self._labels = np.empty(self.capacity, np.int32)
+        self._sums = np.empty(self.capacity, np.float64)
+        self._tmp_path = f"{path}.tmp{os.getpid()}"
+        self._matrix_offset = _layout(self.capacity, self.feature_size)[2]
+        self._file = open(self._tmp_path, "w+b")
+        self._file.truncate(_layout(self.capacity, self.feature_size)[3])
+
+    def append(self, histograms, labels):
+        """Add a samples-by-bins chunk of histograms and their labels"""
+        histograms = np.asarray(histograms, dtype=np.float32).reshape(-1, self.feature_size)
+        labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        chunk = len(labels)
+        if self.count + chunk > self.capacity:
+            raise ValueError(f"Model was laid out for {self.capacity} samples")
+        start = self.count
+        self._labels[start:start + chunk] = labels
+        self._sums[start:start + chunk] = histograms.sum(axis=1, dtype=np.float64)
+        # One contiguous run per bin row: this chunk's columns of that row
+        rows = np.ascontiguousarray(histograms.T)
+        row_bytes = 4 * self.capacity
+        offset = self._matrix_offset + 4 * start
+        for row in rows:
+            self._file.seek(offset)
+            self._file.write(row.data)
+            offset += row_bytes
+        self.count += chunk
+
+    @property
+    def labels(self):
+        """Labels of the samples appended so far"""
+        return self._labels[:self.count]
+
+    def _write_index(self, f, samples):
+        labels_offset, sums_offset, _, end = _layout(samples, self.feature_size)
+        params = self.params
+        f.seek(0)
+        f.write(_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, params['radius'], params['neighbors'],
+                             params['grid_x'], params['grid_y'], float(params['threshold']),
+                             samples, self.feature_size))
+        f.seek(labels_offset)
+        f.write(self._labels[:samples].tobytes())
+        f.seek(sums_offset)
+        f.write(self._sums[:samples].tobytes())
+        f.truncate(end)
+
+    def close(self):
+        """Finish the file and move it into place, returns the number of samples written"""
+        if self.count == self.capacity:
+            self._write_index(self._file, self.count)
+            self._file.close()
+        else:
+            # Some expected samples never came (unreadable images): copy the
+            # filled part of every row into a file laid out for the real count
+            compact_path = f"{self._tmp_path}c"
+            matrix_offset = _layout(self.count, self.feature_size)[2]
+            with open(compact_path, "w+b") as out:
+                self._write_index(out, self.count)
+                for row in range(self.feature_size):
+                    self._file.seek(self._matrix_offset + 4 * self.capacity * row)
+                    data = self._file.read(4 * self.count)
+                    out.seek(matrix_offset + 4 * self.count * row)
+                    out.write(data)
+            self._file.close()
+            os.replace(compact_path, self._tmp_path)
+        os.replace(self._tmp_path, self.path)
+        return self.count
+
+    def abort(self):
+        """Drop the partial file, leaving any existing model untouched"""
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+def read_binary_model(path, mmap=True):
+    """Read a binary model, returns (params, bins, labels, sums)
+
+    With mmap=True the histogram matrix is memory-mapped read-only, so loading
+    costs a header read regardless of model size. On Windows a mapped file
+    cannot be replaced, so anything that stays loaded while the model may be
+    retrained must read with mmap=False.
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError(f"{path} is not a binary LBPH model")
+    magic, version, radius, neighbors, grid_x, grid_y, threshold, samples, feature_size = _HEADER.unpack(header)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"{path} is not a binary LBPH model")
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary model version {version}")
+
+    labels_offset, sums_offset, matrix_offset, end = _layout(samples, feature_size)
+    if os.path.getsize(path) < end:
+        raise ValueError(f"{path} is truncated")
+
+    params = {'radius': radius, 'neighbors': neighbors, 'grid_x': grid_x,
+              'grid_y': grid_y, 'threshold': threshold}
+
+    if samples == 0:
+        return params, np.empty((feature_size, 0), np.float32), np.empty(0, np.int32), np.empty(0, np.float64)
+
+    if mmap:
+        labels = np.memmap(path, dtype=np.int32, mode="r", offset=labels_offset, shape=(samples,))
+        sums = np.memmap(path, dtype=np.float64, mode="r", offset=sums_offset, shape=(samples,))
+        bins = np.memmap(path, dtype=np.float32, mode="r", offset=matrix_offset, shape=(feature_size, samples))
+    else:
+        with open(path, "rb") as f:
+            f.seek(labels_offset)
+            labels = np.fromfile(f, dtype=np.int32, count=samples)
+            f.seek(sums_offset)
+            sums = np.fromfile(f, dtype=np.float64, count=samples)
+            f.seek(matrix_offset)
+            bins = np.fromfile(f, dtype=np.float32, count=samples * feature_size).reshape(feature_size, samples)
+    return params, bins, labels, sums
+
+
+def binary_path_for(yml_path):
+    """Binary model path that sits next to a Trainer.yml"""
+    return os.path.splitext(yml_path)[0] + BINARY_EXTENSION
+
+
+def convert_yml_to_binary(yml_path, binary_path=None):
+    """Convert an OpenCV LBPH Trainer.yml into the binary format, returns the output path"""
+    from face_matcher import LBPHMatcher
+
+    matcher = LBPHMatcher()
+    matcher.read(yml_path)
+    binary_path = binary_path or binary_path_for(yml_path)
+    matcher.save(binary_path)
+    return binary_path
+
+
+def resolve_model_path(label_path):
+    """Pick the model to load from a label directory
+
+    Prefers the binary model when it is at least as new as Trainer.yml, and
+    falls back to the YAML model otherwise. Returns None when neither exists.
+    """
+    yml_path = os.path.join(label_path, YAML_MODEL_NAME)
+    binary_path = os.path.join(label_path, BINARY_MODEL_NAME)
+    has_yml = os.path.isfile(yml_path)
+    has_binary = os.path.isfile(binary_path)
+
+    if has_binary and (not has_yml or os.path.getmtime(binary_path) >= os.path.getmtime(yml_path)):
+        return binary_path
+    if has_yml:
+        return yml_path
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Trainer.yml to the binary model format")
+    parser.add_argument("yml", nargs="?", default=os.path.join("TrainingImageLabel", YAML_MODEL_NAME))
+    parser.add_argument("--output", default=None, help=f"Output path (default: alongside the input with {BINARY_EXTENSION})")
+    args = parser.parse_args()
+
+    output = convert_yml_to_binary(args.yml, args.output)
+    print(f"Binary model written to: {output} ({os.path.getsize(output) / 1e6:.1f} MB)")
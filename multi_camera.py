@@ -0,0 +1,272 @@
+import datetime
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+# Frames waiting for recognition; cameras drop frames rather than fall behind when it is full
+QUEUE_SIZE = 64
+
+# Largest number of face crops matched in one predict_batch() call
+BATCH_SIZE = 32
+
+
+class AttendanceRoster:
+    """Deduplicated attendance for one session, shared by all cameras"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+        self.seen_by = {}
+
+    def mark(self, student_id, name, camera):
+        """Record a student the first time any camera recognizes them, returns True if new"""
+        with self._lock:
+            if student_id in self._records:
+                return False
+            now = datetime.datetime.now()
+            self._records[student_id] = {
+                'id': student_id,
+                'name': name,
+                'date': now.strftime('%d-%m-%Y'),
+                'time': now.strftime('%I:%M:%S %p'),
+            }
+            self.seen_by[student_id] = camera
+        print(f"Recognized: {name} ({student_id}) on camera {camera}")
+        return True
+
+    def records(self):
+        """Attendance rows in the order students were first seen"""
+        with self._lock:
+            return [dict(record) for record in self._records.values()]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+
+class CameraWorker(threading.Thread):
+    """Grabs frames from one source, detects faces and queues the crops for recognition"""
+
+    def __init__(self, index, source, session):
+        super().__init__(name=f"camera-{index}", daemon=True)
+        self.index = index
+        self.source = source
+        self.session = session
+        self.frames = 0
+        self.faces = 0
+        self.dropped = 0
+        self.latest = None
+        self.started_at = None
+        self.stopped_at = None
+
+    def run(self):
+        # CascadeClassifier is not shared between threads, each camera loads its own
+        detector = cv2.CascadeClassifier(self.session.cascade_path)
+        self.started_at = time.perf_counter()
+        try:
+            while not self.session.stopping.is_set():
+                ok, frame = self.source.read()
+                if not ok:
+                    break
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                faces = detector.detectMultiScale(gray, 1.2, 5)
+                self.frames += 1
+                self.faces += len(faces)
+                self.latest = frame
+
+                if len(faces) == 0:
+                    continue
+                boxes = [tuple(int(v) for v in face) for face in faces]
+                if self.session.normalizer is not None:
+                    crops = self.session.normalizer.crops(gray, boxes)
+                else:
+                    crops = [gray[y:y + h, x:x + w].copy() for (x, y, w, h) in boxes]
+                try:
+                    self.session.jobs.put_nowait((self.index, boxes, crops))
+                except queue.Full:
+                    self.dropped += 1
+        except Exception as e:
+            print(f"Camera {self.index} error: {e}")
+        finally:
+            self.stopped_at = time.perf_counter()
+            self.source.release()
+
+    def fps(self):
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.stopped_at or time.perf_counter()) - self.started_at
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+
+class MultiCameraSession:
+    """Attendance from several frame sources at once
+
+    Every camera has its own grab-and-detect thread; face crops from all of
+    them go through one queue to a pool of recognition threads that match
+    them in batches, and recognized students are merged into one roster.
+    OpenCV detection and the numpy matcher release the GIL, so the threads
+    run on separate cores.
+    """
+
+    def __init__(self, sources, recognizer, cascade_path, students, threshold=60, workers=None, normalizer=None):
+        self.sources = list(sources)
+        self.recognizer = recognizer
+        self.cascade_path = cascade_path
+        self.students = students
+        self.threshold = threshold
+        self.normalizer = normalizer
+        self.workers = workers or max(1, min(len(self.sources), (os.cpu_count() or 2) - 1))
+        self.roster = AttendanceRoster()
+        self.jobs = queue.Queue(maxsize=QUEUE_SIZE)
+        self.stopping = threading.Event()
+        self.cameras = [CameraWorker(i, source, self) for i, source in enumerate(self.sources)]
+        self.annotations = {}
+        self.batches = 0
+        self.crops = 0
+        self.recognize_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        self._recognizers = []
+        self._started_at = None
+        self._duration = 0.0
+
+    def _cameras_running(self):
+        return any(camera.is_alive() for camera in self.cameras)
+
+    def _next_batch(self):
+        """Block for one queued frame, then take whatever else is waiting up to BATCH_SIZE crops"""
+        while True:
+            try:
+                jobs = [self.jobs.get(timeout=0.1)]
+                break
+            except queue.Empty:
+                if not self._cameras_running():
+                    return []
+        count = len(jobs[0][2])
+        while count < BATCH_SIZE:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            jobs.append(job)
+            count += len(job[2])
+        return jobs
+
+    def _recognize_loop(self):
+        while True:
+            jobs = self._next_batch()
+            if not jobs:
+                return
+            crops = [crop for _, _, job_crops in jobs for crop in job_crops]
+            start = time.perf_counter()
+            try:
+                predictions = self.recognizer.predict_batch(crops)
+            except Exception as e:
+                print(f"Recognition error: {e}")
+                predictions = [None] * len(crops)
+            with self._stats_lock:
+                self.batches += 1
+                self.crops += len(crops)
+                self.recognize_seconds += time.perf_counter() - start
+
+            offset = 0
+            for camera, boxes, job_crops in jobs:
+                labels = []
+                for box, prediction in zip(boxes, predictions[offset:offset + len(job_crops)]):
+                    labels.append((box,) + self._label(camera, prediction))
+                offset += len(job_crops)
+                self.annotations[camera] = labels
+
+    def _label(self, camera, prediction):
+        """Overlay text and colour for one prediction, marking attendance when recognized"""
+        if prediction is None:
+            return "Error", (0, 0, 255)
+        serial, conf = prediction
+        if conf >= self.threshold:
+            return "Unknown", (0, 0, 255)
+        student = self.students.get(serial)
+        if student is None:
+            return f"Unknown ({conf:.0f}%)", (0, 0, 255)
+        student_id, name = student
+        self.roster.mark(student_id, name, camera)
+        return f"{name} ({conf:.0f}%)", (0, 255, 0)
+
+    def _show(self):
+        """Draw the latest frame of every camera, returns the key pressed"""
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        for camera in self.cameras:
+            frame = camera.latest
+            if frame is None:
+                continue
+            frame = frame.copy()
+            for (x, y, w, h), text, colour in self.annotations.get(camera.index, []):
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                cv2.putText(frame, text, (x, y - 10), font, 0.8, colour, 2)
+            cv2.putText(frame, f"Recognized: {len(self.roster)} students", (10, 30),
+                        font, 0.7, (255, 255, 255), 2)
+            cv2.putText(frame, f"Camera {camera.index}: {camera.fps():.1f} FPS  Press 'q' to quit", (10, 60),
+                        font, 0.7, (255, 255, 255), 2)
+            cv2.imshow(f"Taking Attendance - Camera {camera.index}", frame)
+        return cv2.waitKey(1) & 0xFF
+
+    def run(self, duration=30, display=True):
+        """Run until the time limit, 'q' or every source ends; returns the attendance rows"""
+        self._started_at = time.perf_counter()
+        try:
+            for camera in self.cameras:
+                camera.start()
+            self._recognizers = [threading.Thread(target=self._recognize_loop, name=f"recognize-{i}", daemon=True)
+                                 for i in range(self.workers)]
+            for worker in self._recognizers:
+                worker.start()
+
+            while self._cameras_running():
+                if duration is not None and time.perf_counter() - self._started_at > duration:
+                    break
+                if display:
+                    if self._show() == ord('q'):
+                        break
+                else:
+                    time.sleep(0.05)
+        finally:
+            self.stop()
+            if display:
+                cv2.destroyAllWindows()
+        return self.roster.records()
+
+    def stop(self):
+        """Stop the cameras and let the recognition pool finish what is queued
+
+        Safe after a failed or partial start: threads that never started are skipped.
+        """
+        self.stopping.set()
+        for camera in self.cameras:
+            if camera.is_alive():
+                camera.join()
+        for worker in self._recognizers:
+            if worker.is_alive():
+                worker.join()
+        if self._started_at is not None:
+            self._duration = time.perf_counter() - self._started_at
+
+    def summary(self):
+        """Per-camera throughput and recognition pool statistics"""
+        return {
+            'duration_s': self._duration,
+            'workers': self.workers,
+            'students': len(self.roster),
+            'recognition': {
+                'batches': self.batches,
+                'crops': self.crops,
+                'mean_batch_ms': self.recognize_seconds / self.batches * 1000 if self.batches else 0.0,
+            },
+            'cameras': [{
+                'source': camera.source.description if hasattr(camera.source, 'description') else str(camera.source),
+                'frames': camera.frames,
+                'faces': camera.faces,
+                'dropped_frames': camera.dropped,
+                'fps': camera.fps(),
+            } for camera in self.cameras],
+        }
@@ -0,0 +1,132 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from PIL import Image
+
+import face_normalizer
+import model_store
+from face_matcher import LBPHMatcher
+from training_job import TrainingCancelled
+
+# Below this many images starting worker processes costs more than it saves
+PARALLEL_MIN_SAMPLES = 500
+
+# Shards per worker: more shards balance uneven images and give finer progress
+SHARDS_PER_WORKER = 4
+
+
+def training_samples(directory, extensions=('.jpg',)):
+    """(path, label) of every training image, labels parsed from name.serial.id.n.jpg, in a stable order"""
+    samples = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith(extensions):
+            continue
+        try:
+            samples.append((os.path.join(directory, filename), int(filename.split(".")[1])))
+        except (ValueError, IndexError):
+            print(f"Error processing {filename}: no serial number in the name")
+    return samples
+
+
+def load_training_face(path, normalizer):
+    """Decode a training image as the backend does (PIL grayscale) and normalize it"""
+    return normalizer.normalize(np.array(Image.open(path).convert('L'), 'uint8'))
+
+
+def configured_workers():
+    """Worker processes for training (ATTENDANCE_TRAIN_WORKERS, 'auto' for one per core)"""
+    value = os.environ.get("ATTENDANCE_TRAIN_WORKERS", "auto").strip().lower()
+    if value in ("", "auto", "0"):
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def _shard_histograms(samples, normalizer_params, matcher_params):
+    """Worker: histograms and labels of one shard, unreadable images skipped"""
+    normalizer = face_normalizer.FaceNormalizer(**normalizer_params)
+    matcher = LBPHMatcher(**matcher_params)
+    histograms = np.empty((len(samples), matcher.feature_size), np.float32)
+    labels = np.empty(len(samples), np.int32)
+    count = 0
+    for path, label in samples:
+        try:
+            face = load_training_face(path, normalizer)
+        except (OSError, ValueError) as e:
+            print(f"Error processing {path}: {e}")
+            continue
+        histograms[count] = matcher.compute_histogram(face)
+        labels[count] = label
+        count += 1
+    return histograms[:count], labels[:count]
+
+
+def compute_histograms_parallel(samples, normalizer, matcher, workers, progress=None, cancelled=None):
+    """Histograms and labels of (path, label) samples, computed in shards by worker processes
+
+    Shards are contiguous slices merged back in order, so the result is
+    identical to computing the samples one by one. progress(stage, done,
+    total) is called as shards finish; cancelled() is checked in between.
+    """
+    shard_count = min(len(samples), workers * SHARDS_PER_WORKER)
+    bounds = np.linspace(0, len(samples), shard_count + 1).astype(int)
+    shards = [samples[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    results = [None] * len(shards)
+
+    # Spawned so it is safe from the GUI process, which has Tk and camera threads
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        pending = {executor.submit(_shard_histograms, shard, normalizer.params, matcher.params): index
+                   for index, shard in enumerate(shards)}
+        done_samples = 0
+        while pending:
+            finished, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if cancelled is not None and cancelled():
+                raise TrainingCancelled()
+            for future in finished:
+                index = pending.pop(future)
+                results[index] = future.result()
+                done_samples += len(shards[index])
+                if progress is not None:
+                    progress("histograms", done_samples, len(samples))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if not results:
+        return np.empty((0, matcher.feature_size), np.float32), np.empty(0, np.int32)
+    return (np.concatenate([histograms for histograms, _ in results]),
+            np.concatenate([labels for _, labels in results]))
+
+
+def train_parallel(directory, normalizer=None, workers=None, matcher=None, extensions=('.jpg',),
+                   progress=None, cancelled=None):
+    """Train a matcher on a training image directory, in worker processes when it is large enough"""
+    normalizer = normalizer or face_normalizer.default_normalizer()
+    matcher = matcher or LBPHMatcher()
+    workers = workers or configured_workers()
+    samples = training_samples(directory, extensions)
+    if workers > 1 and len(samples) >= PARALLEL_MIN_SAMPLES:
+        histograms, labels = compute_histograms_parallel(samples, normalizer, matcher, workers, progress, cancelled)
+    else:
+        histograms, labels = _shard_histograms(samples, normalizer.params, matcher.params)
+    matcher.set_histograms(histograms, labels)
+    return matcher
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the face model with several worker processes")
+    parser.add_argument("--images", default="TrainingImage", help="Training image directory")
+    parser.add_argument("--output", default=os.path.join("TrainingImageLabel", "Trainer.yml"))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = train_parallel(args.images, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    model.save(args.output)
+    model.save(model_store.binary_path_for(args.output))
+    print(f"Trained on {len(model.labels)} images in {elapsed:.2f}s with {args.workers or configured_workers()} workers")
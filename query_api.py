@@ -0,0 +1,258 @@
+import base64
+import csv
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import threading
+
+from flask import Blueprint, request, jsonify, make_response
+
+import attendance_aggregates
+import metrics
+import tenant_models
+
+# Read-only JSON views of registrations and attendance for dashboards:
+#   GET /api/students                           registered students with attendance totals
+#   GET /api/attendance?from=&to=               attendance records in a date range
+#   GET /api/students/<id>/attendance?from=&to= one student's days present
+# Every route takes ?tenant=, ?fields=a,b, ?limit= and the ?cursor= of the previous page.
+blueprint = Blueprint("query_api", __name__, url_prefix="/api")
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+STUDENT_FIELDS = ('serial', 'id', 'name', 'days_present', 'class_days', 'percentage', 'first_seen', 'last_seen')
+ATTENDANCE_FIELDS = ('id', 'name', 'date', 'time', 'last_seen')
+HISTORY_FIELDS = ('date', 'time', 'last_seen')
+
+QUERIES = metrics.REGISTRY.counter("attendance_query_requests_total", "Query API requests by route and HTTP status", ["route", "status"])
+
+
+class QueryError(ValueError):
+    """Raised for a malformed query parameter, answered with 400"""
+
+
+def _stamp(path):
+    """(path, mtime_ns, size) of a file, None times for a missing one"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+_students_cache = {}
+_students_lock = threading.Lock()
+
+
+def registered_students(student_file):
+    """Rows of StudentDetails.csv as (serial, id, name), reparsed only when the file changes"""
+    stamp = _stamp(student_file)
+    with _students_lock:
+        cached = _students_cache.get(student_file)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    students = []
+    if stamp[1] is not None:
+        with open(student_file, newline='') as f:
+            for row in csv.DictReader(f):
+                try:
+                    serial = int(row['SERIAL NO.'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                students.append((serial, str(row.get('ID') or '').strip(), str(row.get('NAME') or '').strip()))
+        students.sort()
+    with _students_lock:
+        _students_cache[student_file] = (stamp, students)
+    return students
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(types):
+    """Sort key of the last item of the previous page (?cursor=), None on the first page
+
+    types are the key's element types, checked so a cursor from another
+    route or a tampered one is rejected rather than compared.
+    """
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise QueryError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != len(types) \
+            or not all(type(value) is kind for value, kind in zip(key, types)):
+        raise QueryError("Invalid cursor")
+    return tuple(key)
+
+
+def paginate(items, key, after, limit):
+    """One page of items (already in key order) following the `after` key, and the next cursor
+
+    Keyset pagination: the cursor is the last key returned, so records
+    written between polls never shift or repeat a page.
+    """
+    if after is not None:
+        items = itertools.dropwhile(lambda item: key(item) <= after, items)
+    page = list(itertools.islice(items, limit + 1))
+    if len(page) > limit:
+        return page[:limit], encode_cursor(key(page[limit - 1]))
+    return page, None
+
+
+def _limit():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise QueryError("limit must be an integer")
+    if limit < 1:
+        raise QueryError("limit must be positive")
+    return min(limit, MAX_LIMIT)
+
+
+def _fields(allowed):
+    """Fields requested with ?fields=a,b, all of them by default"""
+    value = request.args.get('fields', '').strip()
+    if not value:
+        return allowed
+    fields = tuple(field.strip() for field in value.split(",") if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise QueryError(f"Unknown fields: {', '.join(unknown)} (available: {', '.join(allowed)})")
+    return fields
+
+
+def _date_range():
+    start, end = request.args.get('from'), request.args.get('to')
+    try:
+        start = attendance_aggregates.normalize_date(start) if start else None
+        end = attendance_aggregates.normalize_date(end) if end else None
+    except ValueError as e:
+        raise QueryError(str(e))
+    return start, end
+
+
+def _tenant_root():
+    return tenant_models.tenant_root(request.args.get('tenant'))
+
+
+def _aggregates(root):
+    return attendance_aggregates.aggregates_for(os.path.join(root, "Attendance"))
+
+
+def _select(record, fields):
+    return {field: record.get(field) for field in fields}
+
+
+def _respond(route, stamps, build):
+    """JSON response validated by the stamps of the files it is built from
+
+    The ETag covers the data version and the query, Last-Modified is the
+    newest file's time. A poll presenting either unchanged gets a 304
+    before any data is read.
+    """
+    version = repr((stamps, request.path, sorted(request.args.items(multi=True))))
+    etag = hashlib.sha1(version.encode()).hexdigest()[:24]
+    mtimes = [mtime for _, mtime, _ in stamps if mtime is not None]
+    last_modified = datetime.datetime.fromtimestamp(max(mtimes) // 10 ** 9 if mtimes else 0, datetime.timezone.utc)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+    if not_modified:
+        response = make_response("", 304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Cacheable, but always revalidated so dashboards see new records on the next poll
+    response.cache_control.no_cache = True
+    QUERIES.inc(route=route, status=str(response.status_code))
+    return response
+
+
+def _query(route, handler):
+    """Run a route handler, answering bad parameters with 400 and unknown tenants with 404"""
+    try:
+        return handler()
+    except QueryError as e:
+        QUERIES.inc(route=route, status="400")
+        return jsonify({'error': str(e)}), 400
+    except tenant_models.UnknownTenant as e:
+        QUERIES.inc(route=route, status="404")
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        QUERIES.inc(route=route, status="500")
+        print(f"❌ Error in {route}:", e)
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@blueprint.route('/students', methods=['GET'])
+def students():
+    def handler():
+        fields, limit, after = _fields(STUDENT_FIELDS), _limit(), decode_cursor((int, str))
+        root = _tenant_root()
+        student_file = os.path.join(root, "StudentDetails", "StudentDetails.csv")
+        aggregates = _aggregates(root)
+
+        def build():
+            totals = {student['id']: student for student in aggregates.students()}
+            class_days = aggregates.class_days()
+            records = ({'serial': serial, 'id': student_id, 'name': name, 'days_present': 0,
+                        'class_days': class_days, 'percentage': 0.0, 'first_seen': None, 'last_seen': None,
+                        **{k: v for k, v in totals.get(student_id, {}).items() if k not in ('id', 'name')}}
+                       for serial, student_id, name in registered_students(student_file))
+            page, cursor = paginate(records, lambda r: (r['serial'], r['id']), after, limit)
+            return {'items': [_select(r, fields) for r in page], 'next_cursor': cursor}
+
+        return _respond("/api/students", [_stamp(student_file)] + aggregates.version(), build)
+
+    return _query("/api/students", handler)
+
+
+@blueprint.route('/attendance', methods=['GET'])
+def attendance():
+    def handler():
+        fields, limit, after = _fields(ATTENDANCE_FIELDS), _limit(), decode_cursor((str, str, str))
+        start, end = _date_range()
+        aggregates = _aggregates(_tenant_root())
+
+        def build():
+            # Skip whole days before the cursor instead of reading them
+            first = start if after is None else max(start or after[0], after[0])
+
+            def records():
+                for date in aggregates.dates(first, end):
+                    yield from sorted(aggregates.day(date), key=lambda r: (r['time'], r['id']))
+
+            page, cursor = paginate(records(), lambda r: (r['date'], r['time'], r['id']), after, limit)
+            return {'items': [_select(r, fields) for r in page], 'next_cursor': cursor}
+
+        return _respond("/api/attendance", aggregates.version(), build)
+
+    return _query("/api/attendance", handler)
+
+
+@blueprint.route('/students/<student_id>/attendance', methods=['GET'])
+def student_attendance(student_id):
+    def handler():
+        fields, limit, after = _fields(HISTORY_FIELDS), _limit(), decode_cursor((str,))
+        start, end = _date_range()
+        aggregates = _aggregates(_tenant_root())
+
+        def build():
+            first = start if after is None else max(start or after[0], after[0])
+            history = aggregates.history(student_id, first, end)
+            page, cursor = paginate(iter(history), lambda r: (r['date'],), after, limit)
+            return {'id': student_id, 'items': [_select(r, fields) for r in page], 'next_cursor': cursor}
+
+        return _respond("/api/students/<id>/attendance", aggregates.version(), build)
+
+    return _query("/api/students/<id>/attendance", handler)
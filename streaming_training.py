@@ -0,0 +1,139 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+import face_normalizer
+import model_store
+import parallel_training
+from face_matcher import LBPHMatcher, YamlModelWriter
+from training_job import TrainingCancelled
+
+# Peak memory reporting; not available on Windows (psutil is used there when installed)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Faces decoded and histogrammed at a time; bounds the working set (~64 KB of histogram per face)
+CHUNK_SIZE = int(os.environ.get("ATTENDANCE_TRAIN_CHUNK", "256"))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB, None when it cannot be measured"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on macOS, kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    # Peak working set on Windows, current RSS where psutil has no peak
+    return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+
+def iter_training_faces(samples, normalizer):
+    """Decode and normalize (path, label) samples one at a time, skipping unreadable images"""
+    for path, label in samples:
+        try:
+            yield parallel_training.load_training_face(path, normalizer), label
+        except (OSError, ValueError) as e:
+            print(f"Error processing {path}: {e}")
+
+
+def iter_chunks(faces, size):
+    """Group (face, label) pairs into lists of at most `size`"""
+    chunk = []
+    for item in faces:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def train_streaming(image_dir, model_path, normalizer=None, matcher=None, chunk_size=CHUNK_SIZE,
+                    write_yaml=True, progress=None, cancelled=None):
+    """Train from a training image directory with memory bounded by chunk_size, not dataset size
+
+    Faces are decoded through a generator and histogrammed a chunk at a
+    time; each chunk goes straight into the binary model (and Trainer.yml
+    when write_yaml is set) and is then dropped. model_path is the
+    Trainer.yml path, the binary model is written next to it. Returns a
+    report with the sample count, time taken and the process's peak RSS.
+    """
+    normalizer = normalizer or face_normalizer.default_normalizer()
+    matcher = matcher or LBPHMatcher()
+    samples = parallel_training.training_samples(image_dir)
+    start = time.perf_counter()
+    if not samples:
+        # Nothing to train on; keep the existing model rather than writing an empty one
+        return {'samples': 0, 'skipped': 0, 'chunks': 0, 'chunk_size': chunk_size,
+                'seconds': 0.0, 'peak_rss_mb': peak_rss_mb()}
+
+    binary = model_store.BinaryModelWriter(model_store.binary_path_for(model_path), matcher.params,
+                                           len(samples), matcher.feature_size)
+    yaml = YamlModelWriter(model_path, matcher.params) if write_yaml else None
+    histograms = np.empty((chunk_size, matcher.feature_size), np.float32)
+    chunks = 0
+    try:
+        for chunk in iter_chunks(iter_training_faces(samples, normalizer), chunk_size):
+            if cancelled is not None and cancelled():
+                raise TrainingCancelled()
+            for row, (face, _) in enumerate(chunk):
+                histograms[row] = matcher.compute_histogram(face)
+            binary.append(histograms[:len(chunk)], [label for _, label in chunk])
+            if yaml is not None:
+                yaml.append(histograms[:len(chunk)])
+            chunks += 1
+            if progress is not None:
+                progress("histograms", binary.count, len(samples))
+        if cancelled is not None and cancelled():
+            raise TrainingCancelled()
+    except BaseException:
+        binary.abort()
+        if yaml is not None:
+            yaml.abort()
+        raise
+
+    if binary.count == 0:
+        # Every image failed to decode; keep the existing model like an empty directory does
+        binary.abort()
+        if yaml is not None:
+            yaml.abort()
+        return {'samples': 0, 'skipped': len(samples), 'chunks': chunks, 'chunk_size': chunk_size,
+                'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+
+    if progress is not None:
+        progress("writing", 0, 0)
+    # YAML first: the binary model is only preferred when it is at least as new
+    if yaml is not None:
+        yaml.close(binary.labels)
+    count = binary.close()
+    return {'samples': count, 'skipped': len(samples) - count, 'chunks': chunks, 'chunk_size': chunk_size,
+            'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+
+
+def format_report(report):
+    peak = report['peak_rss_mb']
+    return (f"Streaming training: {report['samples']} images in {report['chunks']} chunks of "
+            f"{report['chunk_size']} ({report['skipped']} skipped), {report['seconds']:.2f}s, "
+            f"peak RSS {'n/a' if peak is None else f'{peak:.0f} MB'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the face model with bounded memory")
+    parser.add_argument("--images", default="TrainingImage", help="Training image directory")
+    parser.add_argument("--output", default=os.path.join("TrainingImageLabel", model_store.YAML_MODEL_NAME))
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="Faces processed at a time")
+    parser.add_argument("--no-yaml", action="store_true", help="Only write the binary model")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    report = train_streaming(args.images, args.output, chunk_size=args.chunk, write_yaml=not args.no_yaml)
+    print(format_report(report))
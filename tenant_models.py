@@ -0,0 +1,211 @@
+import csv
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from face_matcher import LBPHMatcher
+import model_shards
+import model_store
+
+# Each tenant (department) has the app's usual layout under tenants/<name>/
+TENANTS_DIR = os.environ.get("ATTENDANCE_TENANTS_DIR", "tenants")
+
+# Upper bound on the memory held by cached models
+DEFAULT_CACHE_BYTES = int(float(os.environ.get("ATTENDANCE_MODEL_CACHE_MB", "512")) * 1024 * 1024)
+
+_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class UnknownTenant(LookupError):
+    """Raised for a tenant or section name that is invalid or has no model"""
+
+
+def tenant_root(tenant, tenants_dir=TENANTS_DIR):
+    """Working directory of a tenant, the current directory when no tenant is given"""
+    if not tenant:
+        return "."
+    if not _NAME.match(tenant):
+        raise UnknownTenant(f"Invalid tenant name: {tenant!r}")
+    root = os.path.join(tenants_dir, tenant)
+    if not os.path.isdir(root):
+        raise UnknownTenant(f"Unknown tenant: {tenant}")
+    return root
+
+
+def load_label_names(csv_path):
+    """Serial number -> label shown for recognized faces, from StudentDetails.csv"""
+    label_dict = {}
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"{csv_path} not found.")
+    with open(csv_path, 'r') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip header
+        for row in reader:
+            if len(row) >= 2 and row[0].isdigit():
+                label_dict[int(row[0])] = row[1]
+    return label_dict
+
+
+def load_students(csv_path):
+    """Serial number -> (student ID, name), from StudentDetails.csv"""
+    students = {}
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"{csv_path} not found.")
+    with open(csv_path, 'r') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip header
+        for row in reader:
+            if len(row) >= 3 and row[0].isdigit():
+                students[int(row[0])] = (row[1], row[2])
+    return students
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class TenantModel:
+    """Recognizer and label names of one tenant, narrowed to a section when it has a shard"""
+
+    def __init__(self, tenant=None, section=None, tenants_dir=TENANTS_DIR):
+        if section and not _NAME.match(section):
+            raise UnknownTenant(f"Invalid section name: {section!r}")
+        self.tenant = tenant
+        self.section = section
+        self.root = tenant_root(tenant, tenants_dir)
+        self.label_path = os.path.join(self.root, "TrainingImageLabel")
+        self.student_file = os.path.join(self.root, "StudentDetails", "StudentDetails.csv")
+        self.attendance_path = os.path.join(self.root, "Attendance")
+
+        model_path = model_shards.resolve_shard_path(self.label_path, section)
+        if model_path is None:
+            model_path = model_store.resolve_model_path(self.label_path)
+        if model_path is None:
+            raise UnknownTenant(f"No trained model for tenant {tenant or '(default)'}")
+        self.model_path = model_path
+        self.recognizer = LBPHMatcher()
+        # Read into memory rather than mapping, so retraining can replace the file while cached
+        self.recognizer.read(model_path, mmap=False)
+        self.label_dict = load_label_names(self.student_file)
+        self.students = load_students(self.student_file)
+        self._stamps = self._current_stamps()
+
+    def _watched(self):
+        """Files whose change means this entry must be reloaded"""
+        paths = [os.path.join(self.label_path, model_store.YAML_MODEL_NAME),
+                 os.path.join(self.label_path, model_store.BINARY_MODEL_NAME),
+                 self.student_file]
+        if self.section:
+            paths.append(model_shards.shard_path(self.label_path, self.section))
+        return paths
+
+    def _current_stamps(self):
+        return tuple(_mtime(path) for path in self._watched())
+
+    def is_stale(self):
+        return self._current_stamps() != self._stamps
+
+    @property
+    def nbytes(self):
+        # Histograms dominate; names are a rough per-entry allowance
+        return int(self.recognizer.nbytes) + 128 * len(self.label_dict)
+
+
+class ModelCache:
+    """LRU cache of loaded tenant models, bounded by their total size in bytes
+
+    Entries are reloaded when their files change. The most recently loaded
+    entry is never evicted, so a single model larger than the budget still
+    works. on_event(name) is called for every hit, miss and eviction.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, loader=TenantModel, on_event=None):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.on_event = on_event
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def _event(self, name):
+        if self.on_event is not None:
+            self.on_event(name)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _lookup(self, key):
+        """Fresh cached entry or None, dropping a stale one (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.is_stale():
+            del self._entries[key]
+            self.bytes -= entry.nbytes
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, tenant=None, section=None):
+        key = (tenant or None, section or None)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+            else:
+                key_lock = self._loading.setdefault(key, threading.Lock())
+        if entry is not None:
+            self._event("hit")
+            return entry
+
+        # Load outside the cache lock so other tenants are served meanwhile;
+        # the per-key lock stops concurrent requests loading the same model twice
+        with key_lock:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+            if entry is not None:
+                self._event("hit")
+                return entry
+
+            try:
+                entry = self.loader(*key)
+            except BaseException:
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+            evicted = 0
+            with self._lock:
+                # Published and unregistered together, so no request can start a second load in between
+                self._loading.pop(key, None)
+                self.misses += 1
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self.bytes -= previous.nbytes
+                self._entries[key] = entry
+                self.bytes += entry.nbytes
+                while self.bytes > self.max_bytes and len(self._entries) > 1:
+                    _, old = self._entries.popitem(last=False)
+                    self.bytes -= old.nbytes
+                    self.evictions += 1
+                    evicted += 1
+        self._event("miss")
+        for _ in range(evicted):
+            self._event("eviction")
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'keys': [list(key) for key in self._entries]}
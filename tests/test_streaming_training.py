@@ -0,0 +1,82 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import face_normalizer
+import model_store
+import parallel_training
+import streaming_training
+from face_matcher import LBPHMatcher
+
+
+def make_training_images(directory, count, unreadable=()):
+    """count training images named like the app's, the indices in unreadable written as garbage"""
+    rng = np.random.default_rng(0)
+    os.makedirs(directory)
+    for i in range(count):
+        path = os.path.join(directory, f"student.{i % 4 + 1}.id{i % 4}.{i}.jpg")
+        if i in unreadable:
+            with open(path, "wb") as f:
+                f.write(b"not a jpeg")
+        else:
+            cv2.imwrite(path, rng.integers(0, 256, (120, 110), dtype=np.uint8))
+
+
+def in_memory_model(directory, normalizer):
+    matcher = LBPHMatcher()
+    samples = parallel_training.training_samples(directory)
+    histograms, labels = parallel_training._shard_histograms(samples, normalizer.params, matcher.params)
+    matcher.set_histograms(histograms, labels)
+    return matcher
+
+
+def assert_same_model(a, b):
+    assert a.params == b.params
+    np.testing.assert_array_equal(a.labels, b.labels)
+    np.testing.assert_array_equal(np.asarray(a.bins), np.asarray(b.bins))
+
+
+# 13 samples in chunks of 5: the last chunk is partial; unreadable images make the
+# binary writer compact its matrix on close()
+@pytest.mark.parametrize("unreadable", [(), (2, 7)])
+def test_streamed_model_matches_in_memory_model(tmp_path, unreadable):
+    images = str(tmp_path / "images")
+    make_training_images(images, 13, unreadable)
+    normalizer = face_normalizer.FaceNormalizer()
+
+    streamed_yaml = str(tmp_path / "streamed" / "Trainer.yml")
+    os.makedirs(os.path.dirname(streamed_yaml))
+    report = streaming_training.train_streaming(images, streamed_yaml, normalizer, chunk_size=5)
+    assert report['samples'] == 13 - len(unreadable)
+    assert report['skipped'] == len(unreadable)
+    assert report['chunks'] == -(-(13 - len(unreadable)) // 5)
+
+    expected = in_memory_model(images, normalizer)
+    reference_yaml = str(tmp_path / "reference" / "Trainer.yml")
+    os.makedirs(os.path.dirname(reference_yaml))
+    expected.save(reference_yaml)
+    expected.save(model_store.binary_path_for(reference_yaml))
+
+    for path in (model_store.binary_path_for(streamed_yaml), streamed_yaml):
+        streamed = LBPHMatcher()
+        streamed.read(path, mmap=False)
+        assert_same_model(streamed, expected)
+    with open(model_store.binary_path_for(streamed_yaml), "rb") as a, \
+            open(model_store.binary_path_for(reference_yaml), "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_unreadable_images_keep_existing_model(tmp_path):
+    images = str(tmp_path / "images")
+    make_training_images(images, 3, unreadable=(0, 1, 2))
+    model_path = str(tmp_path / "Trainer.yml")
+    LBPHMatcher().save(model_path)
+    before = os.path.getmtime(model_path)
+
+    report = streaming_training.train_streaming(images, model_path, chunk_size=2)
+    assert report['samples'] == 0
+    assert os.path.getmtime(model_path) == before
+    assert not os.path.exists(model_store.binary_path_for(model_path))
+    assert sorted(os.listdir(tmp_path)) == ["Trainer.yml", "images"]
@@ -0,0 +1,148 @@
+import atexit
+import multiprocessing
+import queue
+import time
+
+# Minimum seconds between two progress events of the same stage
+PROGRESS_INTERVAL = 0.1
+
+# Seconds a cancelled worker gets to stop on its own before it is terminated
+CANCEL_GRACE = 5.0
+
+
+class TrainingCancelled(Exception):
+    """Raised inside training when the job was cancelled"""
+
+
+def _run(events, cancel, prototypes):
+    """Worker process: train with a fresh backend and report through the event queue"""
+    from attendance_backend import AttendanceBackend
+
+    last = {}
+
+    def progress(stage, done, total):
+        now = time.monotonic()
+        # Always report the first and last step of a stage, throttle the rest
+        if done in (0, 1, total) or now - last.get(stage, 0.0) >= PROGRESS_INTERVAL:
+            last[stage] = now
+            events.put({'type': 'progress', 'stage': stage, 'done': done, 'total': total})
+
+    try:
+        success, message = AttendanceBackend().train_images(prototypes, progress=progress,
+                                                            cancelled=cancel.is_set)
+    except Exception as e:
+        success, message = False, f"Training failed: {str(e)}"
+    events.put({'type': 'done', 'success': success, 'message': message,
+                'cancelled': cancel.is_set()})
+
+
+class TrainingJob:
+    """Model training in a separate process
+
+    The worker streams progress events ({'type': 'progress', 'stage',
+    'done', 'total'}, then one {'type': 'done', 'success', 'message',
+    'cancelled'}) that the caller collects with poll(). Images are decoded
+    in the worker, so their memory is returned when it exits, and model
+    files are replaced atomically, so running sessions and the Flask server
+    only ever see the old or the new model.
+    """
+
+    def __init__(self, prototypes=None):
+        # Spawned rather than forked: the GUI process has Tk and camera threads
+        self._context = multiprocessing.get_context("spawn")
+        self._events = self._context.Queue()
+        self._cancel = self._context.Event()
+        # Not a daemon, so it may start its own workers (see parallel_training);
+        # an app exiting mid-training cancels it instead of leaving it behind
+        self._process = self._context.Process(target=_run, args=(self._events, self._cancel, prototypes))
+        self._cancel_time = None
+        self.result = None
+
+    def start(self):
+        self._process.start()
+        atexit.register(self.cancel)
+        return self
+
+    def poll(self):
+        """Events received since the last call, never blocks"""
+        events = []
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if event['type'] == 'done':
+                self.result = (event['success'], event['message'])
+            events.append(event)
+
+        if self.result is None and not self._process.is_alive() and self._process.exitcode is not None:
+            # One more look, the final event may have arrived after the first drain
+            try:
+                event = self._events.get(timeout=0.5)
+            except queue.Empty:
+                event = {'type': 'done', 'success': False, 'cancelled': self._cancel.is_set(),
+                         'message': "Training cancelled" if self._cancel.is_set()
+                         else f"Training worker exited with code {self._process.exitcode}"}
+            if event['type'] == 'done':
+                self.result = (event['success'], event['message'])
+            events.append(event)
+        elif self._cancel_time is not None and self.result is None \
+                and time.monotonic() - self._cancel_time > CANCEL_GRACE:
+            self._process.terminate()
+        return events
+
+    def cancel(self):
+        """Ask the worker to stop; it is terminated if it has not stopped within CANCEL_GRACE"""
+        if self._cancel_time is None:
+            self._cancel_time = time.monotonic()
+            self._cancel.set()
+
+    def done(self):
+        return self.result is not None
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def wait(self, timeout=None, on_event=None):
+        """Block until the job finishes, returns (success, message) or None on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.result is None:
+            for event in self.poll():
+                if on_event is not None:
+                    on_event(event)
+            if self.result is None:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                time.sleep(0.05)
+        self._process.join(1.0)
+        return self.result
+
+
+def describe(event):
+    """One-line status text for a progress event"""
+    if event['type'] == 'done':
+        return event['message']
+    stage, done, total = event['stage'], event['done'], event['total']
+    labels = {'loading': "Loading images", 'histograms': "Computing histograms",
+              'writing': "Writing model", 'written': "Model written",
+              'compressing': "Compressing model", 'sections': "Building section models"}
+    label = labels.get(stage, stage)
+    if total:
+        return f"{label}... {done}/{total}"
+    return label if stage == 'written' else f"{label}..."
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the face model in a worker process")
+    parser.add_argument("--prototypes", type=int, default=None, help="Compress to this many prototypes per student")
+    args = parser.parse_args()
+
+    job = TrainingJob(prototypes=args.prototypes).start()
+    try:
+        success, message = job.wait(on_event=lambda event: print(describe(event)))
+    except KeyboardInterrupt:
+        job.cancel()
+        success, message = job.wait()
+    raise SystemExit(0 if success else 1)